@@ -0,0 +1,81 @@
+import os
+from typing import Dict, Optional, Tuple
+
+ERROR_WINDOW = float(os.getenv('ERROR_WINDOW', 3600))
+
+Fingerprint = Tuple[str, str, str]
+
+
+def fingerprint(error: BaseException) -> Fingerprint:
+    """Возвращает отпечаток ошибки: класс, класс причины и код ответа.
+
+    Текст ошибки в отпечаток не входит: в нём бывают параметры запроса,
+    которые меняются от опроса к опросу.
+    """
+    cause = error.__cause__ or error.__context__
+    status_code = getattr(error, 'status_code', None)
+    return (
+        type(error).__name__,
+        '' if cause is None else type(cause).__name__,
+        '' if status_code is None else str(status_code),
+    )
+
+
+def describe(key: Fingerprint) -> str:
+    """Возвращает описание ошибки по отпечатку.
+
+    Текст ошибки в описание не входит: в параметрах запроса есть токен
+    Практикума, а сводку могут читать все участники чата.
+    """
+    name, cause, status_code = key
+    details = []
+    if cause:
+        details.append(f'причина {cause}')
+    if status_code:
+        details.append(f'код ответа {status_code}')
+    return ', '.join([name, *details])
+
+
+class ErrorDigest:
+    """Копит ошибки подписок одного чата, не больше одной сводки за окно.
+
+    Первая ошибка после тишины отправляется сразу, остальные ошибки окна
+    собираются по отпечаткам и попадают в следующую сводку. Сводка
+    выдаётся следующей ошибкой или flush после конца окна, поэтому
+    накопленные ошибки не ждут новой ошибки.
+    """
+
+    def __init__(self, window: float = ERROR_WINDOW) -> None:
+        """Создаёт пустую сводку."""
+        self.window = window
+        self.sent_at: Optional[float] = None
+        self.counts: Dict[Fingerprint, int] = {}
+
+    def add(self, error: BaseException, now: float) -> Optional[str]:
+        """Учитывает ошибку и возвращает сводку, если её пора отправить."""
+        key = fingerprint(error)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return self.flush(now)
+
+    def flush(self, now: float) -> Optional[str]:
+        """Возвращает сводку накопленных ошибок, если окно закончилось."""
+        if not self.counts:
+            return None
+        if self.sent_at is not None and now - self.sent_at < self.window:
+            return None
+        return self.summary()
+
+    def summary(self) -> str:
+        """Возвращает текст сводки накопленных ошибок."""
+        lines = []
+        for key, count in self.counts.items():
+            line = f'Возникли ошибки ошибки: {describe(key)}'
+            if count > 1:
+                line += f' (повторилась {count} раз)'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def mark_sent(self, now: float) -> None:
+        """Начинает новое окно после отправки сводки."""
+        self.sent_at = now
+        self.counts.clear()
@@ -0,0 +1,81 @@
+import hashlib
+import json
+from http import HTTPStatus
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+import metrics
+
+UNCHANGED: Mapping = MappingProxyType({})
+
+Validators = Tuple[Optional[str], Optional[str], Optional[bytes]]
+
+
+def homeworks_hash(answer: object) -> Optional[bytes]:
+    """Возвращает хеш списка работ ответа или None, если списка нет."""
+    if not isinstance(answer, dict):
+        return None
+    homeworks = answer.get('homeworks')
+    if not isinstance(homeworks, list):
+        return None
+    payload = json.dumps(homeworks, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+
+class AnswerCache:
+    """Валидаторы и хеш последнего обработанного ответа API подписки.
+
+    ETag и Last-Modified отправляются в каждом следующем запросе
+    подписки, хотя from_date сдвигается после каждого опроса. Хешируется
+    только список работ: current_date меняется в каждом ответе. Ответ 304
+    или прежний список работ означают, что разбирать ответ не нужно.
+    Новые валидаторы запоминаются только в commit, после успешной
+    обработки ответа: иначе неотправленное уведомление не повторится.
+    """
+
+    def __init__(self) -> None:
+        """Создаёт пустой кеш."""
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.body_hash: Optional[bytes] = None
+        self._pending: Optional[Validators] = None
+
+    def request_headers(self) -> dict:
+        """Возвращает заголовки условного запроса."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def unchanged(
+        self,
+        status_code: int,
+        headers: Optional[Mapping],
+        answer: object,
+    ) -> bool:
+        """Проверяет, совпадает ли ответ с последним обработанным.
+
+        Для ответа 304 answer не нужен и может быть None.
+        """
+        if status_code == HTTPStatus.NOT_MODIFIED:
+            metrics.API_CACHE.inc('not_modified')
+            self._pending = None
+            return True
+        digest = homeworks_hash(answer)
+        headers = headers or {}
+        self._pending = (
+            headers.get('ETag'), headers.get('Last-Modified'), digest
+        )
+        if digest is not None and digest == self.body_hash:
+            metrics.API_CACHE.inc('unchanged')
+            return True
+        metrics.API_CACHE.inc('miss')
+        return False
+
+    def commit(self) -> None:
+        """Запоминает валидаторы успешно обработанного ответа."""
+        if self._pending is not None:
+            self.etag, self.last_modified, self.body_hash = self._pending
+            self._pending = None
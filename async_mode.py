@@ -0,0 +1,490 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from http import HTTPStatus
+from typing import Callable, Mapping, Optional, Set, Tuple
+
+import aiohttp
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from api_cache import UNCHANGED
+import circuit
+import homework
+import metrics
+from clock import SYSTEM_CLOCK, Clock
+from deadline import Deadline, current_deadline
+from engine import TENANTS_FILE, PollingEngine
+from exceptions import ParseError, RequestError, SendError
+from outbox import Outbox
+from scheduler import PollPolicy
+from sender import (
+    TELEGRAM_CHAT_RATE, TELEGRAM_GLOBAL_RATE, MessageQueue, RetryPolicy,
+)
+from shutdown import SHUTDOWN_TIMEOUT, SIGNALS
+from singleflight import AsyncSingleFlight
+from state import StateStore
+from tenants import Tenant, TenantRegistry, current_tenant
+
+ASYNC_CONCURRENCY = int(os.getenv('ASYNC_CONCURRENCY', 100))
+
+_in_flight = AsyncSingleFlight()
+
+
+async def send_message_async(bot: AsyncTeleBot, message: str) -> None:
+    """Асинхронно отправляет сообщение от бота."""
+    try:
+        logging.debug('Бот начал отправку сообщения')
+        tenant = current_tenant.get()
+        chat_id = (
+            homework.TELEGRAM_CHAT_ID if tenant is None else tenant.chat_id
+        )
+        options = {}
+        if deadline := current_deadline.get():
+            options['timeout'] = deadline.send_timeout()
+        with metrics.SEND_LATENCY.time():
+            await bot.send_message(chat_id=chat_id, text=message, **options)
+        logging.debug('Бот отправил сообщение: %s', message)
+    except (asyncio_helper.ApiException,
+            asyncio_helper.RequestTimeout,
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            ) as error:
+        raise SendError('При отправе сообщения возникла ошибка') from error
+
+
+async def get_api_answer_async(
+    session: aiohttp.ClientSession, timestamp: int
+) -> dict:
+    """Асинхронно получает ответ от сервера."""
+    tenant = current_tenant.get()
+    deadline = current_deadline.get()
+    connect, read = (
+        (homework.CONNECT_TIMEOUT, homework.READ_TIMEOUT) if deadline is None
+        else deadline.timeout(homework.CONNECT_TIMEOUT, homework.READ_TIMEOUT)
+    )
+    headers = homework.HEADERS if tenant is None else {
+        **tenant.headers, **tenant.cache.request_headers()
+    }
+    request_kwargs = {
+        'url': homework.ENDPOINT,
+        'headers': headers,
+        'params': {'from_date': timestamp},
+    }
+    timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    key = (
+        headers.get('Authorization'), timestamp,
+        headers.get('If-None-Match'), headers.get('If-Modified-Since'),
+    )
+    try:
+        status, response_headers, body = await _in_flight.do(
+            key,
+            lambda: _fetch(session, request_kwargs, timeout),
+            None if deadline is None else deadline.remaining(),
+        )
+    except asyncio.TimeoutError:
+        raise RequestError('Не дождались ответа на такой же запрос')
+    if tenant is None:
+        return json.loads(body)
+    answer = None if status == HTTPStatus.NOT_MODIFIED else json.loads(body)
+    if tenant.cache.unchanged(status, response_headers, answer):
+        return UNCHANGED
+    return answer
+
+
+async def _fetch(
+    session: aiohttp.ClientSession,
+    request_kwargs: dict,
+    timeout: aiohttp.ClientTimeout,
+) -> Tuple[int, Mapping, bytes]:
+    breaker = circuit.breaker_for(homework.ENDPOINT)
+    breaker.before_request()
+    try:
+        try:
+            logging.debug('Начато обращение к серверу')
+            with metrics.API_LATENCY.time():
+                async with session.get(
+                    **request_kwargs, timeout=timeout
+                ) as response:
+                    status = response.status
+                    headers = response.headers
+                    body = await response.read()
+            logging.debug('Ответ получен')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            breaker.record_failure()
+            raise RequestError(
+                f'Ошибка во время выполнения запроса: {error!r}, '
+                f'{request_kwargs}'
+            )
+        homework.check_status(breaker, status, request_kwargs)
+    finally:
+        breaker.release()
+    return status, headers, body
+
+
+async def notify_status_async(
+    bot: AsyncTeleBot, tenant: Tenant, response: dict, now: float
+) -> None:
+    """Отправляет уведомления обо всех работах, чей статус изменился."""
+    for work in homework.changed_homeworks(tenant, response, now):
+        try:
+            new_message = homework.parse_status(work)
+        except ParseError as error:
+            await report_error_async(bot, tenant, error, now)
+            tenant.remember(work)
+            continue
+        await send_message_async(bot, new_message)
+        tenant.remember(work)
+        tenant.message = new_message
+
+
+async def report_error_async(
+    bot: AsyncTeleBot, tenant: Tenant, error: Exception, now: float
+) -> None:
+    """Сообщает в чат сводку ошибок не чаще раза за окно."""
+    await send_error_summary_async(
+        bot, tenant, homework.error_summary(tenant, error, now), now
+    )
+
+
+async def send_error_summary_async(
+    bot: AsyncTeleBot, tenant: Tenant, summary: Optional[str], now: float
+) -> None:
+    """Отправляет сводку ошибок, если она есть, и начинает новое окно."""
+    if summary is None:
+        return
+    try:
+        await send_message_async(bot, summary)
+    except SendError as send_error:
+        logging.error('Не удалось сообщить об ошибке: %s', send_error)
+    else:
+        tenant.alerts.mark_sent(now)
+
+
+async def poll_tenant_async(
+    bot: AsyncTeleBot,
+    session: aiohttp.ClientSession,
+    tenant: Tenant,
+    clock: Clock = SYSTEM_CLOCK,
+) -> None:
+    """Выполняет один опрос API для подписки и отправляет уведомления."""
+    context = current_tenant.set(tenant)
+    deadline = current_deadline.set(
+        Deadline(homework.TICK_BUDGET, clock.monotonic)
+    )
+    try:
+        response = await get_api_answer_async(session, tenant.timestamp)
+        if response is not UNCHANGED:
+            current_deadline.get().check('разбор ответа')
+            if homework.check_response(response):
+                await notify_status_async(
+                    bot, tenant, response, clock.time()
+                )
+    except SendError as error:
+        metrics.ERRORS.inc(SendError.__name__)
+        logging.error(
+            'Во время отправки сообщения произошла ошибка: %s', error
+        )
+    except Exception as error:
+        await report_error_async(bot, tenant, error, clock.time())
+    else:
+        homework.advance_timestamp(tenant, response)
+        now = clock.time()
+        await send_error_summary_async(
+            bot, tenant, tenant.alerts.flush(now), now
+        )
+    finally:
+        current_deadline.reset(deadline)
+        current_tenant.reset(context)
+
+
+def is_transient_async(error: Exception) -> bool:
+    """Проверяет, может ли повторная отправка через AsyncTeleBot пройти."""
+    if isinstance(
+        error, (asyncio_helper.RequestTimeout, asyncio.TimeoutError)
+    ):
+        return True
+    if isinstance(error, asyncio_helper.ApiTelegramException):
+        code = error.error_code
+    elif isinstance(error, asyncio_helper.ApiHTTPException):
+        code = error.result.status
+    else:
+        return False
+    return code == HTTPStatus.TOO_MANY_REQUESTS or code >= 500
+
+
+class AsyncMessageQueue(MessageQueue):
+    """Очередь исходящих сообщений для AsyncTeleBot.
+
+    Лимиты частоты, повторы с retry_after и журнал исходящих те же, что
+    у MessageQueue, но отправляет задача цикла событий, и сообщения
+    разных чатов уходят одновременно. Методы send_message, flush,
+    deliver, drain и stop здесь корутины.
+    """
+
+    def __init__(
+        self,
+        bot: AsyncTeleBot,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        clock: Callable[[], float] = time.monotonic,
+        retry_policy: Optional[RetryPolicy] = None,
+        outbox: Optional[Outbox] = None,
+    ) -> None:
+        """Создаёт пустую очередь для бота."""
+        super().__init__(
+            bot, global_rate, chat_rate, clock,
+            retry_policy or RetryPolicy(transient=is_transient_async),
+            outbox,
+        )
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+        self._sends: Set[asyncio.Task] = set()
+
+    def _notify(self) -> None:
+        super()._notify()
+        self._wakeup.set()
+        if self._size or self._in_flight:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    async def send_message(self, chat_id: str, text: str, **kwargs) -> None:
+        """Ставит сообщение в очередь чата.
+
+        С журналом сообщение только дописывается в него и ждёт flush.
+        """
+        super().send_message(chat_id, text)
+
+    async def flush(self) -> None:
+        """Сбрасывает журнал одним fsync и отдаёт сообщения на отправку.
+
+        fsync идёт в потоке, чтобы не останавливать цикл событий.
+        """
+        staged = self._take_staged()
+        if staged:
+            await asyncio.to_thread(self.outbox.sync)
+        for message in staged:
+            self._enqueue(*message)
+
+    async def deliver(
+        self,
+        chat_id: str,
+        text: str,
+        attempt: int = 1,
+        record_id: Optional[int] = None,
+    ) -> None:
+        """Отправляет одно сообщение через бота."""
+        error = None
+        try:
+            with metrics.TELEGRAM_LATENCY.time():
+                await self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as send_error:
+            error = send_error
+        self._settle(chat_id, text, attempt, record_id, error)
+
+    def deliver_due(self) -> Optional[float]:
+        """Начинает отправку всех сообщений, которые позволяют лимиты.
+
+        Возвращает паузу до следующей возможной отправки или None,
+        если очередь пуста.
+        """
+        while True:
+            with self._condition:
+                message, wait = self._pop_due(self.clock())
+            if message is None:
+                return wait
+            task = asyncio.create_task(self.deliver(*message))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.clear()
+            wait = self.deliver_due()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Запускает задачу отправки; вызывается из цикла событий."""
+        self._requeue_outbox()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def drain(self, timeout: float) -> int:
+        """Ждёт отправки очереди не дольше timeout секунд.
+
+        Возвращает число сообщений, которые не успели отправить.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._size + len(self._in_flight)
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Останавливает отправку, начатые отправки отменяются.
+
+        Отменённые сообщения остаются в журнале исходящих.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        tasks = list(self._sends)
+        for task in tasks:
+            task.cancel()
+        if self._task is not None:
+            tasks.append(self._task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+class AsyncPollingEngine(PollingEngine):
+    """Опрашивает наступившие подписки конкурентно в одном цикле событий.
+
+    Одновременно выполняется не больше concurrency опросов. Методы
+    run_pending, run и flush здесь корутины.
+    """
+
+    def __init__(
+        self,
+        bot: AsyncTeleBot,
+        registry: TenantRegistry,
+        session: aiohttp.ClientSession,
+        policy: Optional[PollPolicy] = None,
+        store: Optional[StateStore] = None,
+        concurrency: int = ASYNC_CONCURRENCY,
+    ) -> None:
+        """Ставит в очередь все подписки реестра."""
+        super().__init__(bot, registry, policy=policy, store=store)
+        self.session = session
+        self.concurrency = concurrency
+        self._wakeup = asyncio.Event()
+        self._waiting: Set[asyncio.Task] = set()
+
+    async def run_pending(self, now: float) -> int:
+        """Опрашивает все подписки, время которых наступило.
+
+        После stop опросы, ещё ждущие очереди, не начинаются.
+        """
+        due = self.pop_due(now)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def poll(tenant: Tenant) -> bool:
+            async with semaphore:
+                self._waiting.discard(asyncio.current_task())
+                if self.stopping.is_set():
+                    return False
+                await poll_tenant_async(
+                    self.bot, self.session, tenant, self.clock
+                )
+            return True
+
+        tasks = [asyncio.ensure_future(poll(tenant)) for tenant in due]
+        self._waiting.update(tasks)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self._waiting.difference_update(tasks)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        polled = [
+            tenant for tenant, result in zip(due, results) if result is True
+        ]
+        await self.flush()
+        self.reschedule(polled, now)
+        return len(polled)
+
+    async def run(self, until: Optional[float] = None) -> None:
+        """Цикл опроса всех подписок до until или вызова stop."""
+        while until is None or self.clock.time() < until:
+            with metrics.LOOP_DURATION.time():
+                await self.run_pending(self.clock.time())
+            if self.stopping.is_set():
+                break
+            delay = max(self.wake_at(until) - self.clock.time(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush(self) -> None:
+        """Отдаёт на отправку уведомления тика, сбросив журнал один раз."""
+        if isinstance(self.bot, AsyncMessageQueue):
+            await self.bot.flush()
+
+    def stop(self) -> None:
+        """Просит цикл run завершиться; вызывается из цикла событий.
+
+        Опросы, ждущие очереди, отменяются, начатые доводятся до конца.
+        """
+        super().stop()
+        self._wakeup.set()
+        for task in self._waiting:
+            task.cancel()
+
+
+async def stop_async_engine(
+    engine: AsyncPollingEngine,
+    outbound: AsyncMessageQueue,
+    outbox: Optional[Outbox] = None,
+    timeout: float = SHUTDOWN_TIMEOUT,
+) -> None:
+    """Сохраняет состояние, досылает очередь и закрывает журнал."""
+    engine.close()
+    await outbound.flush()
+    left = await outbound.drain(timeout)
+    await outbound.stop(timeout)
+    if left:
+        logging.warning('Не успели отправить сообщений: %s', left)
+    if outbox is not None:
+        outbox.close()
+
+
+async def run_async_engine(path: str) -> None:
+    """Запускает конкурентный опрос подписок из файла."""
+    if not homework.TELEGRAM_TOKEN:
+        logging.critical('Отсутствует токен Телеграмма')
+        sys.exit()
+    registry = TenantRegistry.from_file(path)
+    store = StateStore(homework.STATE_DB)
+    restored = store.load(registry)
+    logging.info(
+        'Загружено подписок: %s, с сохранённым состоянием: %s',
+        len(registry), restored,
+    )
+    bot = AsyncTeleBot(token=homework.TELEGRAM_TOKEN)
+    outbox = Outbox(homework.OUTBOX_PATH) if homework.OUTBOX_PATH else None
+    outbound = AsyncMessageQueue(bot, outbox=outbox)
+    if outbox is not None:
+        outbox.start()
+    outbound.start()
+    connector = aiohttp.TCPConnector(limit=ASYNC_CONCURRENCY)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        engine = AsyncPollingEngine(outbound, registry, session, store=store)
+        metrics.SCHEDULED_POLLS.set_function(engine.__len__)
+        metrics.OUTBOUND_QUEUE.set_function(outbound.__len__)
+        loop = asyncio.get_running_loop()
+        for signum in SIGNALS:
+            loop.add_signal_handler(signum, engine.stop)
+        try:
+            await engine.run()
+        finally:
+            await stop_async_engine(engine, outbound, outbox)
+            store.close()
+            if asyncio_helper.session_manager.session is not None:
+                await bot.close_session()
+        logging.info('Работа завершена')
+
+
+if __name__ == '__main__':
+    homework.setup_logging()
+    metrics.serve_from_env()
+    if not TENANTS_FILE:
+        logging.critical('Не задан TENANTS_FILE')
+        sys.exit()
+    asyncio.run(run_async_engine(TENANTS_FILE))
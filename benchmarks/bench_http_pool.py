@@ -0,0 +1,44 @@
+"""Задержка get_api_answer с общей сессией и без неё.
+
+Запуск из корня репозитория: python -m benchmarks.bench_http_pool
+"""
+import argparse
+import time
+
+import homework
+import http_client
+from stub_servers import PracticumStub
+
+
+def measure(requests_count: int) -> float:
+    """Возвращает среднее время вызова get_api_answer в секундах."""
+    started = time.perf_counter()
+    for timestamp in range(requests_count):
+        homework.get_api_answer(timestamp)
+    return (time.perf_counter() - started) / requests_count
+
+
+def main() -> None:
+    """Сравнивает новое соединение на каждый запрос с пулом keep-alive."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    with PracticumStub(latency=args.latency) as stub:
+        homework.ENDPOINT = stub.url
+        http_client.close()
+        plain = measure(args.requests)
+        plain_connections = stub.connections
+        http_client.configure()
+        pooled = measure(args.requests)
+        pooled_connections = stub.connections - plain_connections
+        http_client.close()
+    print(f'requests.get: {plain * 1000:.3f} ms/request, '
+          f'{plain_connections} connections')
+    print(f'pooled session: {pooled * 1000:.3f} ms/request, '
+          f'{pooled_connections} connections')
+    print(f'speedup: {plain / pooled:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Накладные расходы журнала на один опрос в потоке опроса.
+
+Запуск из корня репозитория: python -m benchmarks.bench_logging
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import log_config
+
+
+def tick_eager(logger: logging.Logger, timestamp: int, message: str) -> None:
+    """Записи журнала одного опроса в прежнем виде, с f-строками."""
+    logger.debug('Начато обращение к серверу')
+    logger.debug('Ответ получен')
+    logger.debug(f'Бот отправил сообщение: {message}')
+    logger.debug(f'Старая дата запроса {timestamp}')
+    logger.debug(f'Новая дата запроса {timestamp + 600}')
+    logger.debug(f'Следующий запрос будет через {600}')
+
+
+def tick_lazy(logger: logging.Logger, timestamp: int, message: str) -> None:
+    """Те же записи с форматированием в обработчике."""
+    logger.debug('Начато обращение к серверу')
+    logger.debug('Ответ получен')
+    logger.debug('Бот отправил сообщение: %s', message)
+    logger.debug('Старая дата запроса %s', timestamp)
+    logger.debug('Новая дата запроса %s', timestamp + 600)
+    logger.debug('Следующий запрос будет через %s', 600)
+
+
+def measure(tick, logger: logging.Logger, ticks: int) -> float:
+    """Возвращает среднее время опроса в вызывающем потоке в мкс."""
+    message = 'Изменился статус проверки работы "hw.zip".' * 3
+    started = time.perf_counter()
+    for timestamp in range(ticks):
+        tick(logger, timestamp, message)
+    return (time.perf_counter() - started) / ticks * 1e6
+
+
+def make_logger(name: str, level: int, handler: logging.Handler):
+    """Возвращает отдельный логгер с одним обработчиком."""
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def main() -> None:
+    """Сравнивает запись в файл из потока опроса с записью через очередь."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=20000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for level in (logging.DEBUG, logging.INFO):
+            level_name = logging.getLevelName(level)
+            sync_handler = logging.FileHandler(Path(directory, 'sync.log'))
+            sync_handler.setFormatter(logging.Formatter(log_config.LOG_FORMAT))
+            before = measure(
+                tick_eager,
+                make_logger(f'before.{level_name}', level, sync_handler),
+                args.ticks,
+            )
+            sync_handler.close()
+            queue_handler, listener = log_config.queue_logging(
+                log_config.rotating_file_handler(
+                    str(Path(directory, 'queued.log'))
+                )
+            )
+            after = measure(
+                tick_lazy,
+                make_logger(f'after.{level_name}', level, queue_handler),
+                args.ticks,
+            )
+            log_config.stop_listener(listener)
+            print(f'{level_name}: before {before:.1f} us/tick, '
+                  f'after {after:.1f} us/tick, '
+                  f'speedup {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
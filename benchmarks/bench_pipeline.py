@@ -0,0 +1,162 @@
+"""Пропускная способность пути «запрос → проверка → разбор → отправка».
+
+Путь get_api_answer -> check_response -> parse_status -> send_message
+проходят многие подписки на локальных заглушках.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pipeline --tenants 1 100 1000 10000
+Результаты записываются в JSON-файл --output.
+
+Каждый сценарий выполняется в отдельном процессе, поэтому предыдущие
+сценарии не завышают его пиковый RSS. Задержка доставки считается для
+каждого уведомления от начала запроса к API до ответа Telegram на
+отправку, длительность опроса — от начала до конца опроса.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from telebot import TeleBot, apihelper
+
+import homework
+import http_client
+from engine import PollingEngine
+from scheduler import PollPolicy
+from tenants import Tenant, TenantRegistry
+from stub_servers import PracticumStub, TelegramStub
+
+
+def peak_rss_mb() -> float:
+    """Возвращает пиковый RSS процесса в мегабайтах."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list, share: float) -> float:
+    """Возвращает значение, меньше которого доля share значений."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def latency_ms(prefix: str, values: list) -> dict:
+    """Возвращает p50 и p99 значений в миллисекундах."""
+    return {
+        f'{prefix}_p50_ms': round(percentile(values, 0.5) * 1000, 3),
+        f'{prefix}_p99_ms': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+class TimedBot:
+    """Бот, запоминающий, сколько прошло с начала текущего опроса."""
+
+    def __init__(self, bot: TeleBot) -> None:
+        """Оборачивает bot."""
+        self.bot = bot
+        self.poll_started = 0.0
+        self.latencies = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        """Отправляет сообщение и запоминает задержку доставки."""
+        result = self.bot.send_message(chat_id, text, **kwargs)
+        self.latencies.append(time.perf_counter() - self.poll_started)
+        return result
+
+
+def run_scenario(tenants: int, rounds: int, churn: float, seed: int) -> dict:
+    """Опрашивает tenants подписок rounds раз и собирает результаты."""
+    logging.basicConfig(level=logging.CRITICAL)
+    baseline_rss = peak_rss_mb()
+    with PracticumStub(churn=churn, seed=seed) as practicum, \
+            TelegramStub(seed=seed) as telegram:
+        homework.ENDPOINT = practicum.url
+        apihelper.API_URL = telegram.api_url
+        http_client.configure(pool_size=4)
+        registry = TenantRegistry()
+        for number in range(tenants):
+            registry.add(Tenant(f'token{number}', str(number), timestamp=0))
+        bot = TimedBot(TeleBot(token='1234:abcdefg'))
+        engine = PollingEngine(
+            bot, registry, policy=PollPolicy(1, spread=False)
+        )
+        latencies = []
+        poll_tenant = homework.poll_tenant
+
+        def timed_poll(bot, tenant, *args, **kwargs):
+            started = bot.poll_started = time.perf_counter()
+            poll_tenant(bot, tenant, *args, **kwargs)
+            latencies.append(time.perf_counter() - started)
+
+        homework.poll_tenant = timed_poll
+        try:
+            now = int(time.time()) + 2
+            started = time.perf_counter()
+            for _ in range(rounds):
+                engine.run_pending(now)
+                now += 1
+            elapsed = time.perf_counter() - started
+        finally:
+            homework.poll_tenant = poll_tenant
+            http_client.close()
+        notifications = len(telegram.messages)
+    return {
+        'tenants': tenants,
+        'rounds': rounds,
+        'polls': len(latencies),
+        'notifications': notifications,
+        'seconds': round(elapsed, 3),
+        'polls_per_second': round(len(latencies) / elapsed, 1),
+        'notifications_per_second': round(notifications / elapsed, 1),
+        **latency_ms('poll_latency', latencies),
+        **latency_ms('delivery_latency', bot.latencies),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+
+def run_isolated(tenants: int, rounds: int, churn: float, seed: int) -> dict:
+    """Выполняет сценарий в новом интерпретаторе и возвращает результаты."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(
+            run_scenario, tenants, rounds, churn, seed
+        ).result()
+
+
+def main() -> None:
+    """Выполняет все сценарии и записывает отчёт."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--tenants', type=int, nargs='+', default=[1, 100, 1000, 10000]
+    )
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--churn', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--output', default='benchmarks/results/bench_pipeline.json'
+    )
+    args = parser.parse_args()
+    results = []
+    for tenants in args.tenants:
+        result = run_isolated(tenants, args.rounds, args.churn, args.seed)
+        print(json.dumps(result))
+        results.append(result)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'benchmark': 'pipeline',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
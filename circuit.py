@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import metrics
+from clock import SYSTEM_CLOCK, Clock
+from exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+CIRCUIT_FAILURES = int(os.getenv('CIRCUIT_FAILURES', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 60))
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для одного адреса API, общий для всех подписок.
+
+    После failure_threshold сбоев подряд цепь размыкается, и запросы
+    не отправляются reset_timeout секунд. Затем пропускается не больше
+    half_open_probes пробных запросов: успех замыкает цепь, сбой снова
+    размыкает.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURES,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        half_open_probes: int = 1,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        """Создаёт замкнутую цепь."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Пропускает запрос или выбрасывает CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock.monotonic() - self._opened_at < (
+                    self.reset_timeout
+                ):
+                    self._reject()
+                self.state = HALF_OPEN
+                self._probes = 0
+                logging.info('Цепь полузамкнута, пробный запрос к API')
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._reject()
+                self._probes += 1
+
+    def release(self) -> None:
+        """Освобождает пробный запрос, завершившийся без учёта результата.
+
+        Вызывается после каждого запроса: если исход уже учтён через
+        record_success или record_failure, ничего не делает.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def _reject(self) -> None:
+        metrics.SHORT_CIRCUITED.inc()
+        raise CircuitOpenError('API недоступен, запрос пропущен')
+
+    def record_success(self) -> None:
+        """Учитывает успешный запрос."""
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info('Цепь замкнута, API снова доступен')
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """Учитывает сбой запроса."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                self.failures >= self.failure_threshold
+            ):
+                if self.state != OPEN:
+                    logging.warning(
+                        'Цепь разомкнута после %s сбоев подряд', self.failures
+                    )
+                self.state = OPEN
+                self._opened_at = self.clock.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """Возвращает размыкатель для адреса, создавая его при первом вызове."""
+    with _breakers_lock:
+        breaker = _breakers.get(url)
+        if breaker is None:
+            breaker = _breakers[url] = CircuitBreaker()
+        return breaker
+
+
+def register(
+    url: str, breaker: Optional[CircuitBreaker]
+) -> Optional[CircuitBreaker]:
+    """Задаёт размыкатель для адреса и возвращает прежний."""
+    with _breakers_lock:
+        previous = _breakers.pop(url, None)
+        if breaker is not None:
+            _breakers[url] = breaker
+        return previous
@@ -0,0 +1,57 @@
+import threading
+import time
+
+
+class Clock:
+    """Системные часы: текущее время и ожидание."""
+
+    def time(self) -> float:
+        """Возвращает время в секундах от начала эпохи."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Возвращает монотонное время для замера интервалов."""
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Ждёт указанное число секунд."""
+        time.sleep(seconds)
+
+    def wait(self, seconds: float, event: threading.Event) -> bool:
+        """Ждёт указанное число секунд или до установки event.
+
+        Возвращает, установлен ли event.
+        """
+        return event.wait(seconds)
+
+
+class VirtualClock(Clock):
+    """Часы, время которых сдвигается только вызовом sleep.
+
+    Позволяет прогнать недели опроса за доли секунды.
+    """
+
+    def __init__(self, start: float = 0) -> None:
+        """Устанавливает начальное время."""
+        self.now = float(start)
+
+    def time(self) -> float:
+        """Возвращает виртуальное время."""
+        return self.now
+
+    def monotonic(self) -> float:
+        """Возвращает виртуальное время."""
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Мгновенно сдвигает время вперёд."""
+        self.now += max(seconds, 0)
+
+    def wait(self, seconds: float, event: threading.Event) -> bool:
+        """Сдвигает время, если event не установлен."""
+        if not event.is_set():
+            self.sleep(seconds)
+        return event.is_set()
+
+
+SYSTEM_CLOCK = Clock()
@@ -0,0 +1,42 @@
+import math
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional, Tuple
+
+from exceptions import RequestError, SendError
+
+
+class Deadline:
+    """Бюджет времени на один опрос: запрос, разбор и отправку."""
+
+    def __init__(
+        self, budget: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Отсчитывает бюджет от текущего момента."""
+        self.clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self) -> float:
+        """Возвращает оставшееся время в секундах."""
+        return max(self.expires_at - self.clock(), 0)
+
+    def check(self, stage: str, error: type = RequestError) -> float:
+        """Проверяет, что время не вышло, и возвращает остаток."""
+        remaining = self.remaining()
+        if not remaining:
+            raise error(f'Истёк бюджет времени опроса: {stage}')
+        return remaining
+
+    def timeout(self, connect: float, read: float) -> Tuple[float, float]:
+        """Ограничивает таймауты запроса оставшимся временем."""
+        remaining = self.check('запрос к API')
+        return min(connect, remaining), min(read, remaining)
+
+    def send_timeout(self) -> int:
+        """Возвращает таймаут отправки сообщения в целых секундах."""
+        return math.ceil(self.check('отправка сообщения', SendError))
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    'current_deadline', default=None
+)
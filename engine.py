@@ -0,0 +1,294 @@
+import itertools
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from telebot import TeleBot
+
+import homework
+import http_client
+from clock import SYSTEM_CLOCK, Clock
+import metrics
+from outbox import Outbox
+from scheduler import AdaptivePolicy, PollPolicy
+from sender import MessageQueue
+from shutdown import SHUTDOWN_TIMEOUT, GracefulExit
+from state import StateStore
+from tenants import Tenant, TenantRegistry
+from timing_wheel import TimingWheel
+
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+POLL_WORKERS = int(os.getenv('POLL_WORKERS', 0))
+DEFAULT_POLL_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class PollingEngine:
+    """Опрашивает API для всех подписок реестра по общему расписанию."""
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        registry: TenantRegistry,
+        policy: Optional[PollPolicy] = None,
+        store: Optional[StateStore] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        """Ставит в очередь все подписки реестра."""
+        self.bot = bot
+        self.clock = clock
+        self.registry = registry
+        self.policy = policy or AdaptivePolicy(period=homework.RETRY_PERIOD)
+        self.store = store
+        self.stopping = threading.Event()
+        now = self.clock.time()
+        self._wheel: TimingWheel[Tuple[Tenant, int]] = TimingWheel(now)
+        self._tickets = itertools.count()
+        self._live: Dict[Tuple[str, str], int] = {}
+        for tenant in registry:
+            self.schedule(tenant, now + self.policy.first_delay(tenant))
+
+    def __len__(self) -> int:
+        """Возвращает число запланированных опросов."""
+        return len(self._live)
+
+    def schedule(self, tenant: Tenant, due: float) -> None:
+        """Ставит опрос подписки в очередь на указанное время.
+
+        Прежний опрос подписки, если он ещё в очереди, не сработает:
+        у каждой подписки одна цепочка опросов.
+        """
+        ticket = self._live[tenant.key] = next(self._tickets)
+        self._wheel.add(due, (tenant, ticket))
+
+    def subscribe(self, tenant: Tenant) -> Tenant:
+        """Добавляет подписку в реестр и сразу ставит её в очередь."""
+        if tenant not in self.registry:
+            tenant, = self.subscribe_all([tenant])
+        return tenant
+
+    def subscribe_all(self, tenants: Iterable[Tenant]) -> List[Tenant]:
+        """Добавляет новые подписки в реестр и ставит их в очередь.
+
+        Состояние всех добавленных подписок читается одним вызовом load.
+        """
+        added = [
+            self.registry.add(tenant) for tenant in tenants
+            if tenant not in self.registry
+        ]
+        if added and self.store is not None:
+            self.store.load(added)
+        now = self.clock.time()
+        for tenant in added:
+            self.schedule(tenant, now + self.policy.first_delay(tenant))
+        return added
+
+    def unsubscribe(self, tenant: Tenant) -> None:
+        """Удаляет подписку и отменяет её запланированный опрос."""
+        self.registry.remove(tenant)
+        self._live.pop(tenant.key, None)
+
+    def pop_due(self, now: float) -> List[Tenant]:
+        """Снимает с очереди подписки, время опроса которых наступило."""
+        due_tenants = []
+        for due, (tenant, ticket) in self._wheel.pop_due(now):
+            if self._live.get(tenant.key) != ticket:
+                continue
+            del self._live[tenant.key]
+            if self.registry.get(tenant.key) is not tenant:
+                continue
+            metrics.SCHEDULER_LAG.observe(max(self.clock.time() - due, 0))
+            due_tenants.append(tenant)
+        return due_tenants
+
+    def flush(self) -> None:
+        """Отдаёт на отправку уведомления тика, сбросив журнал один раз."""
+        if isinstance(self.bot, MessageQueue):
+            self.bot.flush()
+
+    def reschedule(self, polled: List[Tenant], now: float) -> None:
+        """Планирует следующие опросы и сохраняет состояние подписок."""
+        for tenant in polled:
+            self.schedule(tenant, now + self.policy.next_delay(tenant, now))
+        if polled and self.store is not None:
+            self.store.save(polled)
+
+    def run_pending(self, now: float) -> int:
+        """Опрашивает все подписки, время которых наступило."""
+        polled = []
+        for tenant in self.pop_due(now):
+            if self.stopping.is_set():
+                break
+            homework.poll_tenant(self.bot, tenant, self.clock)
+            polled.append(tenant)
+        self.flush()
+        self.reschedule(polled, now)
+        return len(polled)
+
+    def wake_at(self, until: Optional[float]) -> float:
+        """Возвращает время ближайшего опроса, не позже until."""
+        wake_at = self._wheel.next_due()
+        if wake_at is None:
+            wake_at = self.clock.time() + self.policy.period
+        if until is not None:
+            wake_at = min(wake_at, until)
+        return wake_at
+
+    def run(self, until: Optional[float] = None) -> None:
+        """Цикл опроса всех подписок до until или вызова stop."""
+        while until is None or self.clock.time() < until:
+            with metrics.LOOP_DURATION.time():
+                self.run_pending(self.clock.time())
+            delay = max(self.wake_at(until) - self.clock.time(), 0)
+            if self.clock.wait(delay, self.stopping):
+                break
+
+    def stop(self) -> None:
+        """Просит цикл run завершиться после текущего опроса."""
+        self.stopping.set()
+
+    def close(self) -> None:
+        """Сохраняет состояние всех подписок."""
+        if self.store is not None:
+            self.store.save(list(self.registry))
+
+
+class ThreadedPollingEngine(PollingEngine):
+    """Опрашивает наступившие подписки в пуле потоков.
+
+    Подписки одного чата опрашиваются по очереди в одном потоке, поэтому
+    уведомления чата приходят в прежнем порядке; разные чаты опрашиваются
+    параллельно. Число одновременных запросов к API ограничивает пул
+    соединений http_client. Без workers и POLL_WORKERS потоков
+    min(32, число процессоров + 4).
+    """
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        registry: TenantRegistry,
+        policy: Optional[PollPolicy] = None,
+        store: Optional[StateStore] = None,
+        clock: Clock = SYSTEM_CLOCK,
+        workers: int = POLL_WORKERS or DEFAULT_POLL_WORKERS,
+    ) -> None:
+        """Ставит в очередь все подписки реестра и создаёт пул потоков."""
+        super().__init__(bot, registry, policy, store, clock)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='poll'
+        )
+        self._futures: List[Future] = []
+
+    def _poll_chat(self, tenants: List[Tenant]) -> List[Tenant]:
+        polled = []
+        for tenant in tenants:
+            if self.stopping.is_set():
+                break
+            homework.poll_tenant(self.bot, tenant, self.clock)
+            polled.append(tenant)
+        return polled
+
+    def run_pending(self, now: float) -> int:
+        """Опрашивает все подписки, время которых наступило."""
+        chats: Dict[str, List[Tenant]] = {}
+        for tenant in self.pop_due(now):
+            chats.setdefault(tenant.chat_id, []).append(tenant)
+        self._futures = [
+            self.executor.submit(self._poll_chat, tenants)
+            for tenants in chats.values()
+        ]
+        if self.stopping.is_set():
+            self._cancel()
+        wait(self._futures)
+        polled = [
+            tenant
+            for future in self._futures if not future.cancelled()
+            for tenant in future.result()
+        ]
+        self.flush()
+        self.reschedule(polled, now)
+        return len(polled)
+
+    def _cancel(self) -> None:
+        for future in self._futures:
+            future.cancel()
+
+    def stop(self) -> None:
+        """Просит цикл run завершиться; не начатые опросы отменяются."""
+        super().stop()
+        self._cancel()
+
+    def shutdown(self) -> None:
+        """Дожидается текущих опросов и останавливает пул."""
+        self.executor.shutdown(cancel_futures=True)
+
+    def close(self) -> None:
+        """Останавливает пул и сохраняет состояние всех подписок."""
+        self.shutdown()
+        super().close()
+
+
+def stop_engine(
+    engine: PollingEngine,
+    outbound: MessageQueue,
+    outbox: Optional[Outbox] = None,
+    timeout: float = SHUTDOWN_TIMEOUT,
+) -> None:
+    """Сохраняет состояние, досылает очередь и закрывает журнал.
+
+    Сообщения, не отправленные за timeout секунд, остаются в журнале
+    исходящих и уходят после перезапуска; без журнала они теряются.
+    """
+    engine.close()
+    outbound.flush()
+    left = outbound.drain(timeout)
+    outbound.stop(timeout)
+    if left:
+        logging.warning('Не успели отправить сообщений: %s', left)
+    if outbox is not None:
+        outbox.close()
+    logging.info('Работа завершена')
+
+
+def run_engine(path: str) -> None:
+    """Запускает опрос подписок из файла в одном процессе."""
+    if not homework.TELEGRAM_TOKEN:
+        logging.critical('Отсутствует токен Телеграмма')
+        sys.exit()
+    registry = TenantRegistry.from_file(path)
+    store = StateStore(homework.STATE_DB)
+    restored = store.load(registry)
+    logging.info(
+        'Загружено подписок: %s, с сохранённым состоянием: %s',
+        len(registry), restored,
+    )
+    http_client.configure()
+    bot = TeleBot(token=homework.TELEGRAM_TOKEN)
+    outbox = Outbox(homework.OUTBOX_PATH) if homework.OUTBOX_PATH else None
+    outbound = MessageQueue(bot, outbox=outbox)
+    if outbox is not None:
+        outbox.start()
+    outbound.start()
+    if POLL_WORKERS > 0:
+        engine = ThreadedPollingEngine(outbound, registry, store=store)
+    else:
+        engine = PollingEngine(outbound, registry, store=store)
+    metrics.SCHEDULED_POLLS.set_function(engine.__len__)
+    metrics.OUTBOUND_QUEUE.set_function(outbound.__len__)
+    with GracefulExit(engine.stop):
+        try:
+            engine.run()
+        finally:
+            stop_engine(engine, outbound, outbox)
+            store.close()
+
+
+if __name__ == '__main__':
+    homework.setup_logging()
+    metrics.serve_from_env()
+    if TENANTS_FILE:
+        run_engine(TENANTS_FILE)
+    else:
+        homework.main()
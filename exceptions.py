@@ -1,6 +1,14 @@
+from typing import Optional
+
+
 class RequestError(Exception):
     """Некорректный запрос к серверу."""
 
+    def __init__(self, message: str = '', status_code: Optional[int] = None):
+        """Запоминает код ответа сервера, если он был получен."""
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class SendError(Exception):
     """Ошибка при отправке сообщения."""
@@ -8,3 +16,11 @@ class SendError(Exception):
 
 class ParseError(Exception):
     """Ошибка при чтении ответа."""
+
+
+class CircuitOpenError(RequestError):
+    """Запрос не отправлен: цепь к API разомкнута."""
+
+
+class ShutdownRequested(BaseException):
+    """Получен сигнал завершения во время ожидания."""
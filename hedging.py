@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                TimeoutError, wait)
+from typing import Callable, Deque, Optional
+
+import metrics
+from sender import TokenBucket
+
+
+class LatencyTracker:
+    """Скользящая оценка квантиля задержки по последним запросам."""
+
+    def __init__(
+        self, quantile: float = 0.95, window: int = 200, min_samples: int = 20
+    ) -> None:
+        """Задаёт квантиль и размер окна наблюдений."""
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._estimate: Optional[float] = None
+        self._stale = 0
+
+    def record(self, latency: float) -> None:
+        """Добавляет наблюдение."""
+        with self._lock:
+            self._samples.append(latency)
+            self._stale += 1
+
+    def estimate(self) -> Optional[float]:
+        """Возвращает оценку квантиля или None, пока данных мало."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._estimate is None or self._stale >= self.min_samples:
+                ordered = sorted(self._samples)
+                index = min(
+                    int(len(ordered) * self.quantile), len(ordered) - 1
+                )
+                self._estimate = ordered[index]
+                self._stale = 0
+            return self._estimate
+
+
+class Hedger:
+    """Дублирует запрос, если он выполняется дольше p95.
+
+    Побеждает ответ, пришедший первым; проигравший запрос дорабатывает
+    в фоне. Число дублей ограничено max_per_minute.
+    """
+
+    def __init__(
+        self,
+        max_per_minute: float = 10,
+        min_delay: float = 0.05,
+        tracker: Optional[LatencyTracker] = None,
+        workers: int = 8,
+    ) -> None:
+        """Создаёт пул потоков для запросов."""
+        self.min_delay = min_delay
+        self.tracker = tracker or LatencyTracker()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._bucket = TokenBucket(
+            max_per_minute / 60, capacity=max(max_per_minute, 1)
+        )
+        self._bucket_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='hedged-request'
+        )
+
+    def _timed(self, fetch: Callable, kwargs: dict):
+        started = time.monotonic()
+        result = fetch(**kwargs)
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    def _allow_hedge(self) -> bool:
+        with self._bucket_lock:
+            now = time.monotonic()
+            if self._bucket.delay(now):
+                return False
+            self._bucket.take(now)
+            return True
+
+    def call(self, fetch: Callable, **kwargs):
+        """Выполняет fetch(**kwargs), при задержке дублируя запрос."""
+        threshold = self.tracker.estimate()
+        if threshold is None:
+            return self._timed(fetch, kwargs)
+        primary = self._executor.submit(self._timed, fetch, kwargs)
+        try:
+            return primary.result(timeout=max(threshold, self.min_delay))
+        except TimeoutError:
+            pass
+        if not self._allow_hedge():
+            return primary.result()
+        self.hedged += 1
+        metrics.HEDGED_REQUESTS.inc()
+        logging.debug('Запрос дольше %.3f с, отправлен дубль', threshold)
+        hedge = self._executor.submit(self._timed, fetch, kwargs)
+        return self._first_success(primary, hedge)
+
+    def _first_success(self, primary: Future, hedge: Future):
+        done, pending = wait((primary, hedge), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    self.hedge_wins += 1
+                return future.result()
+        for future in pending:
+            return future.result()
+        return primary.result()
+
+    def shutdown(self) -> None:
+        """Останавливает пул, не дожидаясь отставших запросов."""
+        self._executor.shutdown(wait=False)
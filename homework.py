@@ -1,22 +1,48 @@
+from __future__ import annotations
+
 import logging
 import os
 import sys
-import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from http import HTTPStatus
+from typing import List, Optional
 
-import requests
-from dotenv import load_dotenv
-from telebot import TeleBot, apihelper
-
-from exceptions import RequestError, SendError, ParseError
+from api_cache import UNCHANGED
+import circuit
+import http_client
+from clock import SYSTEM_CLOCK, Clock
+import log_config
+import metrics
+from deadline import Deadline, current_deadline
+from exceptions import (
+    CircuitOpenError, ParseError, RequestError, SendError, ShutdownRequested,
+)
+from outbox import Outbox, OutboxBot
+from scheduler import AdaptivePolicy
+from sender import is_transient
+from shutdown import GracefulExit
+from singleflight import SingleFlight
+import startup
+from startup import LazyModule, load_env
+from state import StateStore
+from tenants import Tenant, current_tenant
 
+requests = LazyModule('requests')
+telebot = LazyModule('telebot')
 
-load_dotenv()
+load_env()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 RETRY_PERIOD = 600
+STATE_DB = os.getenv('STATE_DB', 'state.db')
+OUTBOX_PATH = os.getenv('OUTBOX_PATH')
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', 10))
+TICK_BUDGET = float(os.getenv('TICK_BUDGET', 30))
+LOG_FILE = os.getenv('LOG_FILE', 'main.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
@@ -26,6 +52,8 @@ HOMEWORK_VERDICTS = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
+_in_flight = SingleFlight()
+
 TOKENS = {
     'Токен Практикума': PRACTICUM_TOKEN,
     'ID чата': TELEGRAM_CHAT_ID,
@@ -42,43 +70,108 @@ def check_tokens(tokens: dict) -> bool:
     }
     tokens_failure = [name for name, token in TOKENS.items() if token is None]
     if tokens_failure:
-        logging.critical(f'Отсутствуют {tokens_failure}')
+        logging.critical('Отсутствуют %s', tokens_failure)
         return False
     return True
 
 
-def send_message(bot: TeleBot, message: str) -> None:
+def send_message(bot: telebot.TeleBot, message: str) -> None:
     """Отправляет сообщение от бота."""
     try:
         logging.debug('Бот начал отправку сообщения')
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logging.debug(f'Бот отправил сообщение: {message}')
-    except (apihelper.ApiException,
+        tenant = current_tenant.get()
+        chat_id = TELEGRAM_CHAT_ID if tenant is None else tenant.chat_id
+        options = {}
+        if deadline := current_deadline.get():
+            options['timeout'] = deadline.send_timeout()
+        with metrics.SEND_LATENCY.time():
+            bot.send_message(chat_id=chat_id, text=message, **options)
+        logging.debug('Бот отправил сообщение: %s', message)
+    except (telebot.apihelper.ApiException,
             requests.RequestException
             ) as error:
         raise SendError('При отправе сообщения возникла ошибка') from error
 
 
 def get_api_answer(timestamp: int) -> dict:
-    """Получает ответ от сервера."""
+    """Получает ответ от сервера.
+
+    Для подписки запрос условный: если ответ не изменился с последнего
+    обработанного, возвращает api_cache.UNCHANGED.
+    """
+    tenant = current_tenant.get()
+    deadline = current_deadline.get()
+    headers = HEADERS if tenant is None else {
+        **tenant.headers, **tenant.cache.request_headers()
+    }
     request_kwargs = {
         'url': ENDPOINT,
-        'headers': HEADERS,
+        'headers': headers,
         'params': {'from_date': timestamp},
+        'timeout': (
+            (CONNECT_TIMEOUT, READ_TIMEOUT) if deadline is None
+            else deadline.timeout(CONNECT_TIMEOUT, READ_TIMEOUT)
+        ),
     }
+    key = (
+        headers.get('Authorization'), timestamp,
+        headers.get('If-None-Match'), headers.get('If-Modified-Since'),
+    )
     try:
-        logging.debug('Начато обращение к серверу')
-        response = requests.get(**request_kwargs)
-        logging.debug('Ответ получен')
-    except requests.RequestException as error:
-        raise RequestError(
-            f'Ошибка во время выполнения запроса: {error}, {request_kwargs}'
+        response = _in_flight.do(
+            key,
+            lambda: _fetch(request_kwargs),
+            None if deadline is None else deadline.remaining(),
         )
-    if response.status_code != HTTPStatus.OK:
+    except FutureTimeoutError:
+        raise RequestError('Не дождались ответа на такой же запрос')
+    if tenant is None:
+        return response.json()
+    answer = (
+        None if response.status_code == HTTPStatus.NOT_MODIFIED
+        else response.json()
+    )
+    if tenant.cache.unchanged(
+        response.status_code, getattr(response, 'headers', None), answer
+    ):
+        return UNCHANGED
+    return answer
+
+
+def _fetch(request_kwargs: dict) -> requests.Response:
+    breaker = circuit.breaker_for(ENDPOINT)
+    breaker.before_request()
+    try:
+        try:
+            logging.debug('Начато обращение к серверу')
+            with metrics.API_LATENCY.time():
+                response = http_client.get(**request_kwargs)
+            logging.debug('Ответ получен')
+        except requests.RequestException as error:
+            breaker.record_failure()
+            raise RequestError(
+                f'Ошибка во время выполнения запроса: {error}, '
+                f'{request_kwargs}'
+            )
+        check_status(breaker, response.status_code, request_kwargs)
+    finally:
+        breaker.release()
+    return response
+
+
+def check_status(
+    breaker: circuit.CircuitBreaker, status_code: int, request_kwargs: dict
+) -> None:
+    """Учитывает код ответа в размыкателе и проверяет, что он 200 или 304."""
+    if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    if status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
         raise RequestError(
-            f'Ошибочный статус{response.status_code, request_kwargs}'
+            f'Ошибочный статус{status_code, request_kwargs}',
+            status_code=status_code,
         )
-    return response.json()
 
 
 def check_response(response: dict) -> bool:
@@ -118,49 +211,173 @@ def parse_status(homework: dict) -> str:
     )
 
 
-def main() -> None:
+def changed_homeworks(
+    tenant: Tenant, response: dict, now: float
+) -> List[dict]:
+    """Возвращает изменившиеся работы в порядке их обновления."""
+    changed = tenant.diff(response['homeworks'])
+    if not changed:
+        logging.debug('Статусы работ не изменились')
+        return []
+    tenant.last_change = now
+    return sorted(changed, key=lambda hw: hw.get('date_updated', ''))
+
+
+def notify_status(
+    bot: telebot.TeleBot, tenant: Tenant, response: dict, now: float
+) -> None:
+    """Отправляет уведомления обо всех работах, чей статус изменился.
+
+    Работа, которую не удалось разобрать, попадает в сводку ошибок
+    и запоминается, чтобы не задерживать остальные.
+    """
+    for homework in changed_homeworks(tenant, response, now):
+        try:
+            new_message = parse_status(homework)
+        except ParseError as error:
+            report_error(bot, tenant, error, now)
+            tenant.remember(homework)
+            continue
+        send_message(bot, new_message)
+        tenant.remember(homework)
+        tenant.message = new_message
+
+
+def error_summary(
+    tenant: Tenant, error: Exception, now: float
+) -> Optional[str]:
+    """Учитывает ошибку опроса и возвращает сводку, если её пора отправить."""
+    if isinstance(error, CircuitOpenError):
+        logging.warning('Опрос пропущен: %s', error)
+        tenant.errors += 1
+        return None
+    logging.error('Произошла ошибка: %s', error)
+    metrics.ERRORS.inc(type(error).__name__)
+    if isinstance(error, RequestError):
+        tenant.errors += 1
+    return tenant.alerts.add(error, now)
+
+
+def report_error(
+    bot: telebot.TeleBot, tenant: Tenant, error: Exception, now: float
+) -> None:
+    """Сообщает в чат сводку ошибок не чаще раза за окно."""
+    send_error_summary(bot, tenant, error_summary(tenant, error, now), now)
+
+
+def send_error_summary(
+    bot: telebot.TeleBot, tenant: Tenant, summary: Optional[str], now: float
+) -> None:
+    """Отправляет сводку ошибок, если она есть, и начинает новое окно."""
+    if summary is None:
+        return
+    try:
+        send_message(bot, summary)
+    except SendError as send_error:
+        logging.error('Не удалось сообщить об ошибке: %s', send_error)
+    else:
+        tenant.alerts.mark_sent(now)
+
+
+def advance_timestamp(tenant: Tenant, response: dict) -> None:
+    """Сбрасывает счётчик ошибок и сдвигает дату следующего запроса."""
+    tenant.errors = 0
+    tenant.cache.commit()
+    if response is UNCHANGED:
+        return
+    logging.debug('Старая дата запроса %s', tenant.timestamp)
+    tenant.timestamp = response.get('current_date', tenant.timestamp)
+    logging.debug('Новая дата запроса %s', tenant.timestamp)
+
+
+def poll_tenant(
+    bot: telebot.TeleBot, tenant: Tenant, clock: Clock = SYSTEM_CLOCK
+) -> None:
+    """Выполняет один опрос API для подписки и отправляет уведомления."""
+    context = current_tenant.set(tenant)
+    deadline = current_deadline.set(Deadline(TICK_BUDGET, clock.monotonic))
+    try:
+        response = get_api_answer(tenant.timestamp)
+        if response is not UNCHANGED:
+            if budget := current_deadline.get():
+                budget.check('разбор ответа')
+            if check_response(response):
+                notify_status(bot, tenant, response, clock.time())
+    except SendError as error:
+        metrics.ERRORS.inc(SendError.__name__)
+        logging.error(
+            'Во время отправки сообщения произошла ошибка: %s', error
+        )
+    except Exception as error:
+        report_error(bot, tenant, error, clock.time())
+    else:
+        advance_timestamp(tenant, response)
+        now = clock.time()
+        send_error_summary(bot, tenant, tenant.alerts.flush(now), now)
+    finally:
+        current_deadline.reset(deadline)
+        current_tenant.reset(context)
+
+
+def main(clock: Clock = SYSTEM_CLOCK) -> None:
     """Основная логика работы бота."""
     if not check_tokens(TOKENS):
         logging.critical('Программа завершает работу')
         sys.exit()
-    bot = TeleBot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    message = ''
-    while True:
+    bot = telebot.TeleBot(token=TELEGRAM_TOKEN)
+    if OUTBOX_PATH:
+        bot = OutboxBot(bot, Outbox(OUTBOX_PATH), is_transient)
+        logging.info('Повторно отправлено уведомлений: %s', bot.replay())
+        bot.outbox.start()
+    tenant = Tenant(
+        practicum_token=PRACTICUM_TOKEN,
+        chat_id=TELEGRAM_CHAT_ID,
+        timestamp=int(clock.time()),
+    )
+    store = StateStore(STATE_DB)
+    store.load([tenant])
+    policy = AdaptivePolicy(period=RETRY_PERIOD)
+    http_client.configure()
+    with GracefulExit() as stop:
         try:
-            homeworks = get_api_answer(timestamp)
-            if check_response(homeworks):
-                if homeworks := homeworks['homeworks']:
-                    homework = homeworks[0]
-                    if message != (new_message := parse_status(homework)):
-                        send_message(bot, new_message)
-                        message = new_message
-        except SendError as error:
-            logging.error(
-                'Во время отправки сообщения произошла ошибка'
-                f'{error}'
-            )
-        except Exception as error:
-            logging.error(f'Произошла ошибка: {error}')
-            if (
-                message != (new_message := f'Возникли ошибки ошибки: {error}')
-            ):
-                send_message(bot, new_message)
-                message = new_message
-        else:
-            logging.debug(f'Старая дата запроса {timestamp}')
-            timestamp = homeworks.get('current_date', timestamp)
-            logging.debug(f'Новая дата запроса {timestamp}')
+            while not stop.requested:
+                with metrics.LOOP_DURATION.time():
+                    poll_tenant(bot, tenant, clock)
+                    if isinstance(bot, OutboxBot):
+                        bot.flush()
+                    store.save([tenant])
+                delay = policy.next_delay(tenant, clock.time())
+                logging.debug('Следующий запрос будет через %s', delay)
+                with stop.interruptible():
+                    clock.sleep(delay)
+        except ShutdownRequested:
+            pass
         finally:
-            logging.debug(f'Следующий запрос будет через {RETRY_PERIOD}')
-            time.sleep(RETRY_PERIOD)
+            close(bot, store, tenant)
+    logging.info('Работа завершена')
 
 
-if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.DEBUG,
-        filename='main.log',
-        filemode='w',
-        format='%(asctime)s, %(levelname)s, %(message)s, %(name)s'
+def close(bot: telebot.TeleBot, store: StateStore, tenant: Tenant) -> None:
+    """Сохраняет состояние подписки, закрывает соединения и журнал."""
+    store.save([tenant])
+    store.close()
+    http_client.close()
+    if isinstance(bot, OutboxBot):
+        bot.outbox.close()
+
+
+def setup_logging() -> None:
+    """Настраивает запись журнала в файл из фонового потока."""
+    handler, _ = log_config.queue_logging(
+        log_config.rotating_file_handler(LOG_FILE)
     )
+    logging.basicConfig(level=LOG_LEVEL, handlers=[handler])
+
+
+if __name__ == '__main__':
+    if '--startup-profile' in sys.argv:
+        startup.print_profile('homework')
+        sys.exit()
+    setup_logging()
+    metrics.serve_from_env()
     main()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from hedging import Hedger
+from startup import LazyModule
+
+requests = LazyModule('requests')
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+HEDGE_MAX_PER_MINUTE = float(os.getenv('HEDGE_MAX_PER_MINUTE', 0))
+
+_session: Optional[requests.Session] = None
+_hedger: Optional[Hedger] = None
+
+
+def configure(
+    pool_size: int = HTTP_POOL_SIZE,
+    keep_alive: bool = True,
+    hedge_per_minute: float = HEDGE_MAX_PER_MINUTE,
+) -> requests.Session:
+    """Включает общую сессию с пулом соединений для запросов к API.
+
+    При hedge_per_minute > 0 медленные запросы дублируются.
+    """
+    global _session, _hedger
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_maxsize=pool_size, pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    close()
+    _session = session
+    if hedge_per_minute > 0:
+        _hedger = Hedger(max_per_minute=hedge_per_minute, workers=pool_size)
+    return session
+
+
+def install(
+    session: Optional[requests.Session],
+) -> Optional[requests.Session]:
+    """Подменяет общую сессию и возвращает прежнюю.
+
+    Подойдёт любой объект с методом get(**kwargs), например имитация API.
+    """
+    global _session
+    previous, _session = _session, session
+    return previous
+
+
+def close() -> None:
+    """Закрывает общую сессию и все её соединения."""
+    global _session, _hedger
+    if _hedger is not None:
+        _hedger.shutdown()
+        _hedger = None
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def get(**kwargs) -> requests.Response:
+    """Выполняет GET-запрос через общую сессию, если она настроена."""
+    fetch = requests.get if _session is None else _session.get
+    if _hedger is None:
+        return fetch(**kwargs)
+    return _hedger.call(fetch, **kwargs)
@@ -0,0 +1,73 @@
+import atexit
+import gzip
+import os
+import queue
+import shutil
+from logging import Formatter, Handler, LogRecord
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Tuple
+
+LOG_FORMAT = '%(asctime)s, %(levelname)s, %(message)s, %(name)s'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+
+
+def gzip_namer(name: str) -> str:
+    """Добавляет расширение .gz к имени архивного файла журнала."""
+    return f'{name}.gz'
+
+
+def gzip_rotator(source: str, dest: str) -> None:
+    """Сжимает заполненный файл журнала."""
+    with open(source, 'rb') as plain, gzip.open(dest, 'wb') as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+def rotating_file_handler(
+    filename: str,
+    max_bytes: int = LOG_MAX_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+) -> RotatingFileHandler:
+    """Создаёт обработчик, который ротирует и сжимает журнал по размеру."""
+    handler = RotatingFileHandler(
+        filename, maxBytes=max_bytes, backupCount=backup_count,
+        encoding='utf-8',
+    )
+    handler.namer = gzip_namer
+    handler.rotator = gzip_rotator
+    handler.setFormatter(Formatter(LOG_FORMAT))
+    return handler
+
+
+class LazyQueueHandler(QueueHandler):
+    """Кладёт запись в очередь, не форматируя её в вызывающем потоке.
+
+    Очередь не покидает процесс, поэтому аргументы сообщения подставляет
+    уже фоновый слушатель.
+    """
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """Возвращает запись без изменений."""
+        return record
+
+
+def stop_listener(listener: QueueListener) -> None:
+    """Дописывает очередь журнала и останавливает слушатель."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def queue_logging(
+    *handlers: Handler,
+) -> Tuple[QueueHandler, QueueListener]:
+    """Переносит запись журнала в фоновый поток.
+
+    Возвращает обработчик для корневого логгера и запущенный слушатель,
+    который остановится при выходе из программы.
+    """
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return LazyQueueHandler(records), listener
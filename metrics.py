@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence,
+)
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+REGISTRY: List['Metric'] = []
+ENABLED = True
+
+
+class Metric:
+    """Метрика в текстовом формате Prometheus."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        """Регистрирует метрику."""
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterator[str]:
+        """Возвращает строки со значениями метрики."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Возвращает метрику вместе с HELP и TYPE."""
+        return '\n'.join((
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+            *self.samples(),
+        ))
+
+
+class Counter(Metric):
+    """Счётчик с необязательной меткой."""
+
+    kind = 'counter'
+
+    def __init__(
+        self, name: str, documentation: str, label: Optional[str] = None
+    ) -> None:
+        """Создаёт счётчик с нулевым значением."""
+        super().__init__(name, documentation)
+        self.label = label
+        self._values: Dict[Optional[str], float] = {}
+
+    def inc(
+        self, label_value: Optional[str] = None, amount: float = 1
+    ) -> None:
+        """Увеличивает счётчик."""
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_value] = (
+                self._values.get(label_value, 0) + amount
+            )
+
+    def value(self, label_value: Optional[str] = None) -> float:
+        """Возвращает текущее значение."""
+        return self._values.get(label_value, 0)
+
+    def samples(self) -> Iterator[str]:
+        """Возвращает строки со значениями метрики."""
+        with self._lock:
+            values = sorted(
+                self._values.items(), key=lambda item: item[0] or ''
+            )
+        for label_value, value in values:
+            if label_value is None:
+                yield f'{self.name} {value}'
+            else:
+                yield f'{self.name}{{{self.label}="{label_value}"}} {value}'
+
+
+class Gauge(Metric):
+    """Значение, которое считывается функцией в момент запроса метрик."""
+
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], float] = lambda: 0,
+    ) -> None:
+        """Создаёт метрику, читающую значение из function."""
+        super().__init__(name, documentation)
+        self.function = function
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Задаёт источник значения."""
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        """Возвращает строки со значениями метрики."""
+        yield f'{self.name} {self.function()}'
+
+
+class Histogram(Metric):
+    """Гистограмма длительностей с фиксированными корзинами."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Создаёт пустую гистограмму."""
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    @property
+    def count(self) -> int:
+        """Возвращает число наблюдений."""
+        return sum(self._counts)
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение."""
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Замеряет длительность блока кода."""
+        if not ENABLED:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self) -> Iterator[str]:
+        """Возвращает строки со значениями метрики."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f'{self.name}_sum {total}'
+        yield f'{self.name}_count {cumulative}'
+
+
+@contextmanager
+def disabled() -> Iterator[None]:
+    """Отключает сбор метрик на время блока кода."""
+    global ENABLED
+    previous, ENABLED = ENABLED, False
+    try:
+        yield
+    finally:
+        ENABLED = previous
+
+
+def render() -> str:
+    """Возвращает все метрики в текстовом формате Prometheus."""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+def serve(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    import metrics_server
+
+    return metrics_server.serve(port, host)
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """Запускает сервер метрик, если задан METRICS_PORT."""
+    if not METRICS_PORT:
+        return None
+    return serve(int(METRICS_PORT))
+
+
+API_LATENCY = Histogram(
+    'homework_api_request_seconds', 'Длительность get_api_answer.'
+)
+SEND_LATENCY = Histogram(
+    'homework_send_message_seconds', 'Длительность send_message.'
+)
+LOOP_DURATION = Histogram(
+    'homework_loop_iteration_seconds', 'Длительность одной итерации опроса.'
+)
+SCHEDULER_LAG = Histogram(
+    'homework_scheduler_lag_seconds',
+    'Опоздание опроса относительно запланированного времени.',
+)
+ERRORS = Counter('homework_errors_total', 'Ошибки по типам.', label='type')
+TELEGRAM_LATENCY = Histogram(
+    'homework_telegram_request_seconds',
+    'Длительность запроса к Telegram из очереди отправки.',
+)
+OUTBOUND_MESSAGES = Counter(
+    'homework_outbound_messages_total',
+    'Исходы отправки сообщений из очереди.',
+    label='result',
+)
+HEDGED_REQUESTS = Counter(
+    'homework_api_hedged_total', 'Продублированные запросы к API.'
+)
+SHORT_CIRCUITED = Counter(
+    'homework_api_short_circuited_total',
+    'Запросы к API, пропущенные из-за разомкнутой цепи.',
+)
+COALESCED_REQUESTS = Counter(
+    'homework_api_coalesced_total',
+    'Запросы к API, получившие ответ такого же одновременного запроса.',
+)
+API_CACHE = Counter(
+    'homework_api_cache_total',
+    'Ответы API: not_modified и unchanged не разбирались, miss разобран.',
+    label='result',
+)
+OUTBOX_FSYNCS = Counter(
+    'homework_outbox_fsyncs_total', 'Сбросы журнала исходящих на диск.'
+)
+SCHEDULED_POLLS = Gauge(
+    'homework_scheduled_polls', 'Подписок в очереди планировщика.'
+)
+OUTBOUND_QUEUE = Gauge(
+    'homework_outbound_queue_depth', 'Неотправленных сообщений в очереди.'
+)
+SHARD_TENANTS = Gauge(
+    'homework_shard_tenants', 'Подписок в доле этого процесса.'
+)
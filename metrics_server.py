@@ -0,0 +1,31 @@
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import render
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики по GET-запросу."""
+
+    def do_GET(self) -> None:
+        """Отвечает текстом всех метрик."""
+        body = render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Не пишет каждый запрос в журнал."""
+
+
+def serve(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+OUTBOX_COMPACT_BYTES = int(os.getenv('OUTBOX_COMPACT_BYTES', 1024 * 1024))
+OUTBOX_COMPACT_INTERVAL = float(os.getenv('OUTBOX_COMPACT_INTERVAL', 60))
+
+Record = Tuple[int, str, str]
+
+
+class Outbox:
+    """Журнал исходящих уведомлений с упреждающей записью.
+
+    Уведомление дописывается в файл и сбрасывается на диск до отправки,
+    а после отправки помечается выполненным. Потоки, дописывающие записи
+    одновременно, делят один fsync; записи одного тика можно дописать
+    без fsync и сбросить все разом через sync. Невыполненные записи
+    переживают перезапуск и возвращаются pending. Фоновый поток
+    переписывает файл, оставляя только невыполненные записи.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compact_bytes: int = OUTBOX_COMPACT_BYTES,
+        compact_interval: float = OUTBOX_COMPACT_INTERVAL,
+    ) -> None:
+        """Открывает журнал и восстанавливает невыполненные записи."""
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+        self._pending: Dict[int, Tuple[str, str]] = {}
+        self._records = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning('Пропущена повреждённая запись журнала')
+                    continue
+                self._records += 1
+                record_id = entry['id']
+                self._next_id = max(self._next_id, record_id + 1)
+                if entry['op'] == 'add':
+                    self._pending[record_id] = (
+                        entry['chat_id'], entry['text']
+                    )
+                else:
+                    self._pending.pop(record_id, None)
+
+    def __len__(self) -> int:
+        """Возвращает число невыполненных записей."""
+        return len(self._pending)
+
+    def _write(self, entry: dict) -> int:
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._records += 1
+        self._written += 1
+        return self._written
+
+    def append(self, chat_id: str, text: str, sync: bool = True) -> int:
+        """Записывает уведомление и возвращает номер записи.
+
+        Без sync запись попадает на диск только при следующем sync.
+        """
+        with self._lock:
+            record_id = self._next_id
+            self._next_id += 1
+            self._pending[record_id] = (chat_id, text)
+            position = self._write({
+                'op': 'add', 'id': record_id, 'chat_id': chat_id,
+                'text': text,
+            })
+        if sync:
+            self._sync(position)
+        return record_id
+
+    def sync(self) -> None:
+        """Сбрасывает на диск все дописанные записи одним fsync."""
+        self._sync(self._written)
+
+    def _sync(self, position: int) -> None:
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            with self._lock:
+                self._file.flush()
+                position = self._written
+                descriptor = self._file.fileno()
+            os.fsync(descriptor)
+            metrics.OUTBOX_FSYNCS.inc()
+            self._synced = position
+
+    def mark_delivered(self, record_id: int) -> None:
+        """Помечает запись выполненной.
+
+        Отметка не ждёт fsync: если она потеряется, уведомление
+        будет отправлено ещё раз.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._pending.pop(record_id, None) is None:
+                return
+            self._write({'op': 'done', 'id': record_id})
+            self._file.flush()
+
+    def pending(self) -> List[Record]:
+        """Возвращает невыполненные записи в порядке добавления."""
+        with self._lock:
+            return [
+                (record_id, *message)
+                for record_id, message in sorted(self._pending.items())
+            ]
+
+    def compact(self) -> bool:
+        """Переписывает журнал без выполненных записей, если он разросся."""
+        with self._sync_lock, self._lock:
+            if self._records <= 2 * len(self._pending) or (
+                self._file.tell() < self.compact_bytes
+            ):
+                return False
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as log:
+                for record_id, (chat_id, text) in sorted(
+                    self._pending.items()
+                ):
+                    log.write(json.dumps({
+                        'op': 'add', 'id': record_id, 'chat_id': chat_id,
+                        'text': text,
+                    }, ensure_ascii=False) + '\n')
+                log.flush()
+                os.fsync(log.fileno())
+            self._file.close()
+            os.replace(temporary, self.path)
+            self._fsync_directory()
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._records = len(self._pending)
+            self._synced = self._written
+        logging.debug('Журнал исходящих сжат до %s записей', self._records)
+        return True
+
+    def _fsync_directory(self) -> None:
+        descriptor = os.open(
+            os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY
+        )
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.compact_interval):
+            try:
+                self.compact()
+            except OSError as error:
+                logging.error('Не удалось сжать журнал исходящих: %s', error)
+
+    def start(self) -> None:
+        """Запускает фоновое сжатие журнала."""
+        self._thread = threading.Thread(
+            target=self._run, name='outbox-compaction', daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Останавливает сжатие и закрывает журнал."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+
+class OutboxBot:
+    """Бот, записывающий каждое сообщение в журнал до отправки.
+
+    send_message только дописывает запись, а flush сбрасывает журнал
+    одним fsync и отправляет все невыполненные записи по порядку.
+    Запись, отправка которой не пройдёт и при повторе (transient вернул
+    False), помечается выполненной, чтобы не задерживать остальные.
+    """
+
+    def __init__(
+        self, bot, outbox: Outbox, transient: Callable[[Exception], bool]
+    ) -> None:
+        """Оборачивает бота."""
+        self.bot = bot
+        self.outbox = outbox
+        self.transient = transient
+
+    def send_message(self, chat_id: str, text: str, **kwargs) -> None:
+        """Записывает сообщение в журнал; отправит его flush."""
+        self.outbox.append(chat_id, text, sync=False)
+
+    def flush(self) -> int:
+        """Отправляет невыполненные записи и возвращает число отправленных.
+
+        На первой временной неудаче отправка прерывается, чтобы не
+        нарушить порядок: неотправленные записи остаются в журнале до
+        следующего flush.
+        """
+        self.outbox.sync()
+        delivered = 0
+        for record_id, chat_id, text in self.outbox.pending():
+            try:
+                self.bot.send_message(chat_id=chat_id, text=text)
+            except Exception as error:
+                logging.error(
+                    'Не удалось отправить уведомление в чат %s: %s',
+                    chat_id, error,
+                )
+                if self.transient(error):
+                    break
+                self.outbox.mark_delivered(record_id)
+                continue
+            self.outbox.mark_delivered(record_id)
+            delivered += 1
+        return delivered
+
+    def replay(self) -> int:
+        """Отправляет уведомления, не отправленные до перезапуска."""
+        return self.flush()
@@ -0,0 +1,68 @@
+import zlib
+
+from tenants import Tenant
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+def phase(tenant: Tenant) -> float:
+    """Возвращает постоянную для токена подписки долю периода от 0 до 1.
+
+    Чат в расчёт не входит: подписки одного токена опрашиваются в одну
+    секунду, и их одинаковые запросы склеиваются в один.
+    """
+    return zlib.crc32(tenant.practicum_token.encode()) / 2 ** 32
+
+
+class PollPolicy:
+    """Политика опроса с фиксированным периодом.
+
+    При spread первый опрос каждой подписки сдвинут на её постоянную
+    долю периода, и опросы равномерно распределяются по периоду.
+    """
+
+    def __init__(self, period: int, spread: bool = True) -> None:
+        """Запоминает период опроса в секундах."""
+        self.period = period
+        self.spread = spread
+
+    def first_delay(self, tenant: Tenant) -> float:
+        """Возвращает паузу до первого опроса подписки."""
+        return self.period * phase(tenant) if self.spread else 0
+
+    def next_delay(self, tenant: Tenant, now: float) -> int:
+        """Возвращает паузу до следующего опроса подписки."""
+        return self.period
+
+
+class AdaptivePolicy(PollPolicy):
+    """Политика, подстраивающая паузу под состояние подписки.
+
+    Пока работа на ревью, API опрашивается чаще. После долгого затишья
+    и при ошибках запроса пауза растёт, но не выше max_period.
+    """
+
+    def __init__(
+        self,
+        period: int,
+        reviewing_period: int = 180,
+        idle_after: int = SECONDS_IN_DAY,
+        max_period: int = 3600,
+        spread: bool = True,
+    ) -> None:
+        """Задаёт базовый период и границы его изменения."""
+        super().__init__(period, spread)
+        self.reviewing_period = reviewing_period
+        self.idle_after = idle_after
+        self.max_period = max_period
+
+    def next_delay(self, tenant: Tenant, now: float) -> int:
+        """Возвращает паузу до следующего опроса подписки."""
+        if tenant.errors:
+            delay = self.period * 2 ** min(tenant.errors - 1, 16)
+        elif tenant.status == 'reviewing':
+            delay = self.reviewing_period
+        else:
+            idle_days = int(now - tenant.last_change) // self.idle_after
+            delay = self.period * (idle_days + 1)
+        return min(delay, self.max_period)
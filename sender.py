@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import metrics
+from outbox import Outbox
+from startup import LazyModule
+
+requests = LazyModule('requests')
+telebot = LazyModule('telebot')
+
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_CHAT_RATE = 1
+
+
+class TokenBucket:
+    """Ведро токенов: не больше rate событий в секунду."""
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        """Создаёт полное ведро."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated: Optional[float] = None
+
+    def _refill(self, now: float) -> None:
+        if self.updated is not None:
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.rate,
+            )
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Возвращает, сколько ждать до появления токена."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        """Забирает один токен."""
+        self._refill(now)
+        self.tokens -= 1
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Возвращает паузу, которую Telegram попросил выдержать."""
+    result_json = getattr(error, 'result_json', None) or {}
+    parameters = result_json.get('parameters') or {}
+    return parameters.get('retry_after')
+
+
+def is_transient(error: Exception) -> bool:
+    """Проверяет, может ли повторная отправка пройти успешно."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, telebot.apihelper.ApiTelegramException):
+        code = error.error_code
+    elif isinstance(error, telebot.apihelper.ApiHTTPException):
+        code = error.result.status_code
+    else:
+        return False
+    return code == HTTPStatus.TOO_MANY_REQUESTS or code >= 500
+
+
+class RetryPolicy:
+    """Экспоненциальная пауза с джиттером между повторами отправки."""
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        random: Callable[[], float] = random.random,
+        transient: Callable[[Exception], bool] = is_transient,
+    ) -> None:
+        """Задаёт число попыток, границы паузы и повторяемые ошибки."""
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random
+        self.transient = transient
+
+    def delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Возвращает паузу перед повтором или None, если повтора не будет."""
+        if attempt >= self.max_attempts or not self.transient(error):
+            return None
+        backoff = self.base_delay * 2 ** (attempt - 1) * (1 + self.random())
+        requested = retry_after(error)
+        if requested is not None:
+            return max(float(requested), min(backoff, self.max_delay))
+        return min(backoff, self.max_delay)
+
+
+class MessageQueue:
+    """Очередь исходящих сообщений с ограничением частоты отправки.
+
+    Повторяет метод send_message бота, поэтому её можно передать вместо
+    бота: сообщение ставится в очередь, а отдельный поток отправляет его,
+    соблюдая общий лимит Telegram и лимит на один чат. Неудачная отправка
+    повторяется позже и задерживает только свой чат.
+    """
+
+    def __init__(
+        self,
+        bot: telebot.TeleBot,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        clock: Callable[[], float] = time.monotonic,
+        retry_policy: Optional[RetryPolicy] = None,
+        outbox: Optional[Outbox] = None,
+    ) -> None:
+        """Создаёт пустую очередь для бота.
+
+        С outbox сообщение записывается в журнал до постановки в очередь,
+        а при start в очередь возвращаются записи, не отправленные до
+        перезапуска. Отброшенное после всех повторов сообщение остаётся
+        в журнале и уходит после перезапуска.
+        """
+        self.bot = bot
+        self.outbox = outbox
+        self.chat_rate = chat_rate
+        self.clock = clock
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self._global = TokenBucket(global_rate, capacity=global_rate)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pending: Dict[str, Deque[Tuple[str, int, Optional[int]]]] = {}
+        self._in_flight: Set[str] = set()
+        self._ready: List[Tuple[float, str]] = []
+        self._size = 0
+        self._staged: List[Tuple[str, str, Optional[int]]] = []
+        self._version = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __len__(self) -> int:
+        """Возвращает число неотправленных сообщений."""
+        return self._size + len(self._staged)
+
+    def send_message(self, chat_id: str, text: str, **kwargs) -> None:
+        """Ставит сообщение в очередь чата.
+
+        С журналом сообщение только дописывается в него и ждёт flush.
+        """
+        if self.outbox is None:
+            self._enqueue(chat_id, text, None)
+            return
+        record_id = self.outbox.append(chat_id, text, sync=False)
+        with self._condition:
+            self._staged.append((chat_id, text, record_id))
+
+    def _take_staged(self) -> List[Tuple[str, str, Optional[int]]]:
+        with self._condition:
+            staged, self._staged = self._staged, []
+        return staged
+
+    def flush(self) -> None:
+        """Сбрасывает журнал одним fsync и отдаёт сообщения на отправку."""
+        staged = self._take_staged()
+        if staged:
+            self.outbox.sync()
+        for message in staged:
+            self._enqueue(*message)
+
+    def _enqueue(
+        self, chat_id: str, text: str, record_id: Optional[int]
+    ) -> None:
+        with self._condition:
+            queue = self._pending.setdefault(chat_id, deque())
+            if not queue and chat_id not in self._in_flight:
+                bucket = self._buckets.setdefault(
+                    chat_id, TokenBucket(self.chat_rate)
+                )
+                now = self.clock()
+                heapq.heappush(self._ready, (now + bucket.delay(now), chat_id))
+            queue.append((text, 1, record_id))
+            self._size += 1
+            self._version += 1
+            self._notify()
+
+    def _notify(self) -> None:
+        self._condition.notify_all()
+
+    def _pop_due(self, now: float) -> Tuple[Optional[tuple], Optional[float]]:
+        if not self._ready:
+            return None, None
+        ready_at, chat_id = self._ready[0]
+        wait = max(ready_at - now, self._global.delay(now))
+        if wait > 0:
+            return None, wait
+        heapq.heappop(self._ready)
+        text, attempt, record_id = self._pending[chat_id].popleft()
+        self._size -= 1
+        self._buckets[chat_id].take(now)
+        self._global.take(now)
+        self._in_flight.add(chat_id)
+        return (chat_id, text, attempt, record_id), None
+
+    def _finish(
+        self,
+        chat_id: str,
+        text: str,
+        attempt: int,
+        record_id: Optional[int],
+        delay: Optional[float],
+    ) -> None:
+        with self._condition:
+            self._in_flight.discard(chat_id)
+            queue = self._pending[chat_id]
+            now = self.clock()
+            if delay is not None:
+                queue.appendleft((text, attempt + 1, record_id))
+                self._size += 1
+                ready_at = now + delay
+            elif queue:
+                ready_at = now + self._buckets[chat_id].delay(now)
+            else:
+                del self._pending[chat_id]
+                self._notify()
+                return
+            heapq.heappush(self._ready, (ready_at, chat_id))
+            self._version += 1
+            self._notify()
+
+    def deliver(
+        self,
+        chat_id: str,
+        text: str,
+        attempt: int = 1,
+        record_id: Optional[int] = None,
+    ) -> None:
+        """Отправляет одно сообщение через бота."""
+        error = None
+        try:
+            with metrics.TELEGRAM_LATENCY.time():
+                self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as send_error:
+            error = send_error
+        self._settle(chat_id, text, attempt, record_id, error)
+
+    def _settle(
+        self,
+        chat_id: str,
+        text: str,
+        attempt: int,
+        record_id: Optional[int],
+        error: Optional[Exception],
+    ) -> None:
+        delay = None
+        if error is not None:
+            delay = self.retry_policy.delay(error, attempt)
+            if delay is None:
+                self.dropped += 1
+                metrics.OUTBOUND_MESSAGES.inc('dropped')
+                logging.error(
+                    'Сообщение в чат %s не доставлено после %s попыток: %s',
+                    chat_id, attempt, error,
+                )
+            else:
+                self.retried += 1
+                metrics.OUTBOUND_MESSAGES.inc('retried')
+                logging.warning(
+                    'Повтор отправки в чат %s через %.1f с: %s',
+                    chat_id, delay, error,
+                )
+        else:
+            self.delivered += 1
+            metrics.OUTBOUND_MESSAGES.inc('delivered')
+        if record_id is not None and (
+            error is None or not self.retry_policy.transient(error)
+        ):
+            self.outbox.mark_delivered(record_id)
+        self._finish(chat_id, text, attempt, record_id, delay)
+
+    def deliver_due(self) -> Optional[float]:
+        """Отправляет все сообщения, которые позволяют лимиты.
+
+        Возвращает паузу до следующей возможной отправки или None,
+        если очередь пуста.
+        """
+        while True:
+            with self._condition:
+                message, wait = self._pop_due(self.clock())
+            if message is None:
+                return wait
+            self.deliver(*message)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                version = self._version
+            wait = self.deliver_due()
+            with self._condition:
+                if self._stopped:
+                    return
+                if self._version == version:
+                    self._condition.wait(wait)
+
+    def _requeue_outbox(self) -> None:
+        if self.outbox is not None:
+            for record_id, chat_id, text in self.outbox.pending():
+                self._enqueue(chat_id, text, record_id)
+
+    def start(self) -> None:
+        """Запускает поток отправки."""
+        self._requeue_outbox()
+        self._thread = threading.Thread(
+            target=self._run, name='telegram-sender', daemon=True
+        )
+        self._thread.start()
+
+    def drain(self, timeout: float) -> int:
+        """Ждёт отправки очереди не дольше timeout секунд.
+
+        Возвращает число сообщений, которые не успели отправить.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._size or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._size + len(self._in_flight)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Останавливает поток отправки."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
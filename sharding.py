@@ -0,0 +1,301 @@
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from telebot import TeleBot
+
+import homework
+import http_client
+import metrics
+from clock import SYSTEM_CLOCK, Clock
+from engine import TENANTS_FILE, PollingEngine, stop_engine
+from outbox import Outbox
+from scheduler import PollPolicy
+from sender import MessageQueue
+from shutdown import GracefulExit
+from state import StateStore
+from tenants import Tenant, TenantRegistry
+
+SHARD_DB = os.getenv('SHARD_DB', 'shards.db')
+WORKER_ID = os.getenv('WORKER_ID', f'{socket.gethostname()}:{os.getpid()}')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 90))
+HEARTBEAT_INTERVAL = float(os.getenv('HEARTBEAT_INTERVAL', 15))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    tenant_key TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+def stable_hash(value: str) -> int:
+    """Возвращает хеш строки, одинаковый во всех процессах."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def lease_key(tenant: Tenant) -> str:
+    """Возвращает ключ аренды подписки, не раскрывающий токен."""
+    return hashlib.blake2b(
+        f'{tenant.practicum_token}:{tenant.chat_id}'.encode(), digest_size=16
+    ).hexdigest()
+
+
+class HashRing:
+    """Кольцо согласованного хеширования с виртуальными узлами.
+
+    При появлении или уходе одного из N участников меняет владельца
+    примерно 1/N ключей.
+    """
+
+    def __init__(self, members: Iterable[str], replicas: int = 100) -> None:
+        """Раскладывает участников по кольцу."""
+        points = sorted(
+            (stable_hash(f'{member}#{replica}'), member)
+            for member in members
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._members = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Возвращает участника, которому принадлежит ключ."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, stable_hash(key))
+        return self._members[index % len(self._members)]
+
+
+class LeaseStore:
+    """Аренды подписок и список живых процессов в общей базе SQLite.
+
+    Подписку опрашивает только процесс с действующей арендой. Аренда
+    и запись о процессе продлеваются сердцебиением; аренду упавшего
+    процесса можно взять после истечения ttl.
+    """
+
+    def __init__(
+        self, path: str, worker_id: str, ttl: float = LEASE_TTL
+    ) -> None:
+        """Открывает базу и создаёт таблицы, если их нет."""
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def _transaction(self, statements: List[tuple]) -> None:
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, parameters in statements:
+                    if isinstance(parameters, list):
+                        self._connection.executemany(sql, parameters)
+                    else:
+                        self._connection.execute(sql, parameters)
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def heartbeat(self, now: float) -> List[str]:
+        """Продлевает запись о процессе и его аренды, возвращает живых."""
+        expires = now + self.ttl
+        self._transaction([
+            ('INSERT OR REPLACE INTO workers VALUES (?, ?)',
+             (self.worker_id, expires)),
+            ('UPDATE leases SET expires = ? '
+             'WHERE worker_id = ? AND expires > ?',
+             (expires, self.worker_id, now)),
+            ('DELETE FROM workers WHERE expires <= ?', (now,)),
+        ])
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT worker_id FROM workers WHERE expires > ?', (now,)
+            ).fetchall()
+        return sorted(worker_id for worker_id, in rows)
+
+    def acquire(self, keys: Iterable[str], now: float) -> None:
+        """Берёт аренды ключей, которые свободны или истекли."""
+        expires = now + self.ttl
+        self._transaction([(
+            'INSERT INTO leases VALUES (?, ?, ?) '
+            'ON CONFLICT (tenant_key) DO UPDATE SET '
+            'worker_id = excluded.worker_id, expires = excluded.expires '
+            'WHERE leases.worker_id = excluded.worker_id '
+            'OR leases.expires <= ?',
+            [(key, self.worker_id, expires, now) for key in keys],
+        )])
+
+    def release(self, keys: Iterable[str]) -> None:
+        """Отдаёт аренды ключей."""
+        self._transaction([(
+            'DELETE FROM leases WHERE tenant_key = ? AND worker_id = ?',
+            [(key, self.worker_id) for key in keys],
+        )])
+
+    def held(self, now: float) -> Dict[str, float]:
+        """Возвращает действующие аренды процесса и время их истечения."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT tenant_key, expires FROM leases '
+                'WHERE worker_id = ? AND expires > ?',
+                (self.worker_id, now),
+            ).fetchall()
+        return dict(rows)
+
+    def leave(self) -> None:
+        """Удаляет процесс и его аренды, чтобы их сразу забрали другие."""
+        self._transaction([
+            ('DELETE FROM leases WHERE worker_id = ?', (self.worker_id,)),
+            ('DELETE FROM workers WHERE worker_id = ?', (self.worker_id,)),
+        ])
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
+
+
+class ShardedPollingEngine(PollingEngine):
+    """Опрашивает свою долю подписок из общего списка.
+
+    Владелец подписки определяется кольцом живых процессов, а опрос
+    выполняется только при действующей аренде, поэтому подписку
+    не опрашивают два процесса сразу. Подписки, отданные другому
+    процессу, снимаются с расписания, полученные ставятся в него.
+    """
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        tenants: TenantRegistry,
+        leases: LeaseStore,
+        policy: Optional[PollPolicy] = None,
+        store: Optional[StateStore] = None,
+        clock: Clock = SYSTEM_CLOCK,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    ) -> None:
+        """Создаёт движок с пустой долей; она набирается в rebalance."""
+        super().__init__(bot, TenantRegistry(), policy, store, clock)
+        self.tenants = tenants
+        self.leases = leases
+        self.heartbeat_interval = heartbeat_interval
+        self._held: Dict[str, float] = {}
+        self._next_heartbeat = 0.0
+
+    def rebalance(self, now: float) -> None:
+        """Продлевает аренды и приводит свою долю в соответствие с кольцом."""
+        ring = HashRing(self.leases.heartbeat(now))
+        desired = {
+            lease_key(tenant): tenant for tenant in self.tenants
+            if ring.owner(lease_key(tenant)) == self.leases.worker_id
+        }
+        moved = [
+            tenant for tenant in self.registry
+            if lease_key(tenant) not in desired
+        ]
+        if moved and self.store is not None:
+            self.store.save(moved)
+        self.leases.release(lease_key(tenant) for tenant in moved)
+        self.leases.acquire(
+            (key for key in desired if key not in self._held), now
+        )
+        self._held = self.leases.held(now)
+        for tenant in self.registry:
+            if lease_key(tenant) not in self._held:
+                self.unsubscribe(tenant)
+        self.subscribe_all(
+            desired[key] for key in self._held if key in desired
+        )
+        self._next_heartbeat = now + self.heartbeat_interval
+
+    def holds(self, tenant: Tenant, until: float) -> bool:
+        """Проверяет, что аренда подписки действует до until."""
+        return self._held.get(lease_key(tenant), 0) > until
+
+    def run_pending(self, now: float) -> int:
+        """Опрашивает наступившие подписки, пока аренда действует."""
+        if now >= self._next_heartbeat:
+            self.rebalance(now)
+        polled = []
+        for tenant in self.pop_due(now):
+            if self.stopping.is_set():
+                break
+            finish_by = self.clock.time() + homework.TICK_BUDGET
+            if not self.holds(tenant, finish_by):
+                self.rebalance(self.clock.time())
+                if not self.holds(tenant, finish_by):
+                    if tenant in self.registry:
+                        self.schedule(tenant, self._next_heartbeat)
+                    continue
+            homework.poll_tenant(self.bot, tenant, self.clock)
+            polled.append(tenant)
+        self.flush()
+        self.reschedule(polled, now)
+        return len(polled)
+
+    def wake_at(self, until: Optional[float]) -> float:
+        """Возвращает время ближайшего опроса или сердцебиения."""
+        return min(super().wake_at(until), self._next_heartbeat)
+
+
+def run_sharded(path: str) -> None:
+    """Запускает один из процессов, делящих подписки из файла."""
+    if not homework.TELEGRAM_TOKEN:
+        logging.critical('Отсутствует токен Телеграмма')
+        sys.exit()
+    if not homework.STATE_DB or homework.STATE_DB == ':memory:':
+        logging.critical(
+            'Для нескольких процессов нужна общая база состояния STATE_DB'
+        )
+        sys.exit()
+    tenants = TenantRegistry.from_file(path)
+    leases = LeaseStore(SHARD_DB, WORKER_ID)
+    store = StateStore(homework.STATE_DB)
+    http_client.configure()
+    outbox = Outbox(homework.OUTBOX_PATH) if homework.OUTBOX_PATH else None
+    outbound = MessageQueue(
+        TeleBot(token=homework.TELEGRAM_TOKEN), outbox=outbox
+    )
+    if outbox is not None:
+        outbox.start()
+    outbound.start()
+    engine = ShardedPollingEngine(outbound, tenants, leases, store=store)
+    metrics.SCHEDULED_POLLS.set_function(engine.__len__)
+    metrics.OUTBOUND_QUEUE.set_function(outbound.__len__)
+    metrics.SHARD_TENANTS.set_function(engine.registry.__len__)
+    logging.info('Процесс %s делит %s подписок', WORKER_ID, len(tenants))
+    with GracefulExit(engine.stop):
+        try:
+            engine.run()
+        finally:
+            stop_engine(engine, outbound, outbox)
+            leases.leave()
+            leases.close()
+            store.close()
+
+
+if __name__ == '__main__':
+    homework.setup_logging()
+    metrics.serve_from_env()
+    if not TENANTS_FILE:
+        logging.critical('Не задан TENANTS_FILE')
+        sys.exit()
+    run_sharded(TENANTS_FILE)
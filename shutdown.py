@@ -0,0 +1,71 @@
+import logging
+import os
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Tuple
+
+from exceptions import ShutdownRequested
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 0.5))
+SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class GracefulExit:
+    """Перехватывает SIGTERM и SIGINT на время блока with.
+
+    Обработчик выставляет event и вызывает переданные функции, текущий
+    опрос или отправка доводятся до конца. Только ожидание внутри
+    interruptible прерывается исключением ShutdownRequested. Вне главного
+    потока сигналы не перехватываются.
+    """
+
+    def __init__(
+        self,
+        *callbacks: Callable[[], None],
+        signals: Tuple[signal.Signals, ...] = SIGNALS,
+    ) -> None:
+        """Запоминает, что вызвать при получении сигнала."""
+        self.event = threading.Event()
+        self.callbacks = callbacks
+        self.signals = signals
+        self._previous: Dict[signal.Signals, object] = {}
+        self._waiting = False
+
+    @property
+    def requested(self) -> bool:
+        """Проверяет, получен ли сигнал завершения."""
+        return self.event.is_set()
+
+    def __enter__(self) -> 'GracefulExit':
+        """Устанавливает обработчики сигналов."""
+        if threading.current_thread() is threading.main_thread():
+            for signum in self.signals:
+                self._previous[signum] = signal.signal(signum, self._handle)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Возвращает прежние обработчики сигналов."""
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous.clear()
+
+    def _handle(self, signum: int, frame) -> None:
+        name = signal.Signals(signum).name
+        logging.info('Получен сигнал %s, работа завершается', name)
+        self.event.set()
+        for callback in self.callbacks:
+            callback()
+        if self._waiting:
+            raise ShutdownRequested(signum)
+
+    @contextmanager
+    def interruptible(self) -> Iterator[None]:
+        """Разрешает сигналу прервать ожидание внутри блока."""
+        if self.requested:
+            raise ShutdownRequested
+        self._waiting = True
+        try:
+            yield
+        finally:
+            self._waiting = False
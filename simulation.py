@@ -0,0 +1,303 @@
+import argparse
+import json
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Dict, List, Optional
+
+import circuit
+import homework
+import http_client
+import metrics
+from circuit import CircuitBreaker
+from clock import VirtualClock
+from engine import PollingEngine
+from scheduler import PollPolicy
+from tenants import Tenant, TenantRegistry
+
+SECONDS_IN_WEEK = 7 * 24 * 60 * 60
+NEXT_STATUSES = {
+    'reviewing': ('approved', 'rejected'),
+    'rejected': ('reviewing',),
+}
+
+
+class SimulatedResponse:
+    """Ответ имитации API с интерфейсом requests.Response."""
+
+    def __init__(self, status_code: int, data: dict) -> None:
+        """Запоминает код и тело ответа."""
+        self.status_code = status_code
+        self._data = data
+
+    def json(self) -> dict:
+        """Возвращает тело ответа."""
+        return self._data
+
+
+@dataclass
+class StudentState:
+    """Работы одного токена и время их следующего изменения."""
+
+    next_event: float
+    homeworks: List[dict] = field(default_factory=list)
+
+
+class SimulatedPracticum:
+    """Имитация API Практикума, живущая в виртуальном времени.
+
+    Статусы работ меняются случайно, в среднем раз в review_interval
+    секунд. Каждый ответ занимает latency виртуальных секунд. При одном
+    seed и одном порядке запросов результат одинаков.
+    """
+
+    def __init__(
+        self,
+        clock: VirtualClock,
+        review_interval: float = 2 * 24 * 60 * 60,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        latency: float = 0.0,
+    ) -> None:
+        """Создаёт пустую имитацию."""
+        self.clock = clock
+        self.review_interval = review_interval
+        self.error_rate = error_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.changes = 0
+        self._students: Dict[str, StudentState] = {}
+        self._ids = 0
+
+    def _apply_event(self, student: StudentState, moment: float) -> None:
+        open_homeworks = [
+            homework for homework in student.homeworks
+            if homework['status'] in NEXT_STATUSES
+        ]
+        if open_homeworks:
+            homework = self.random.choice(open_homeworks)
+            status = self.random.choice(NEXT_STATUSES[homework['status']])
+        else:
+            self._ids += 1
+            homework = {
+                'id': self._ids,
+                'homework_name': f'hw{self._ids}.zip',
+            }
+            student.homeworks.append(homework)
+            status = 'reviewing'
+        homework['status'] = status
+        homework['updated'] = int(moment)
+        homework['date_updated'] = time.strftime(
+            '%Y-%m-%dT%H:%M:%SZ', time.gmtime(moment)
+        )
+        self.changes += 1
+
+    def _student(self, token: str, now: float) -> StudentState:
+        student = self._students.get(token)
+        if student is None:
+            student = StudentState(next_event=now + self._interval())
+            self._students[token] = student
+        while student.next_event <= now:
+            self._apply_event(student, student.next_event)
+            student.next_event += self._interval()
+        return student
+
+    def _interval(self) -> float:
+        return self.random.expovariate(1 / self.review_interval)
+
+    def get(self, url: str, headers: dict, params: dict, **kwargs):
+        """Отвечает на запрос так же, как homework_statuses/."""
+        self.requests += 1
+        self.clock.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return SimulatedResponse(HTTPStatus.INTERNAL_SERVER_ERROR, {})
+        now = self.clock.time()
+        token = headers['Authorization'][len('OAuth '):]
+        from_date = int(params['from_date'])
+        student = self._student(token, now)
+        return SimulatedResponse(HTTPStatus.OK, {
+            'homeworks': [
+                homework for homework in student.homeworks
+                if homework['updated'] >= from_date
+            ],
+            'current_date': int(now),
+        })
+
+    def quiet_until(self, tenant: Tenant, now: float) -> Optional[float]:
+        """Возвращает время следующего изменения работ подписки.
+
+        None, если опрос в момент now может что-то изменить: запрос может
+        завершиться ошибкой, занимает время или ответ содержит работы.
+        """
+        if self.error_rate or self.latency:
+            return None
+        student = self._student(tenant.practicum_token, now)
+        if any(
+            homework['updated'] >= tenant.timestamp
+            for homework in student.homeworks
+        ):
+            return None
+        return student.next_event
+
+
+class CountingBot:
+    """Бот, который только считает отправленные сообщения."""
+
+    def __init__(self) -> None:
+        """Обнуляет счётчики."""
+        self.sent = 0
+        self.by_chat: Dict[str, int] = {}
+
+    def send_message(self, chat_id: str, text: str, **kwargs) -> None:
+        """Учитывает сообщение."""
+        self.sent += 1
+        self.by_chat[chat_id] = self.by_chat.get(chat_id, 0) + 1
+
+
+class SimulationEngine(PollingEngine):
+    """Движок имитации, который не выполняет опросы без событий.
+
+    Пока у подписки нет ошибок и накопленных сводок, а у студента нет
+    изменений, опрос только сдвигает дату запроса. Такие опросы
+    засчитываются имитации API сразу до следующего изменения, и подписка
+    планируется на первый опрос после него. Все опросы, которые что-то
+    меняют, идут через poll_tenant.
+    """
+
+    until = math.inf
+
+    def __init__(self, api: SimulatedPracticum, *args, **kwargs) -> None:
+        """Запоминает имитацию API, остальное передаёт PollingEngine."""
+        super().__init__(*args, **kwargs)
+        self.api = api
+
+    def run_pending(self, now: float) -> int:
+        """Опрашивает подписки, время которых наступило."""
+        polled = []
+        skipped = 0
+        for tenant in self.pop_due(now):
+            if self.stopping.is_set():
+                break
+            quiet_until = self.quiet_until(tenant, now)
+            if quiet_until is None:
+                homework.poll_tenant(self.bot, tenant, self.clock)
+                polled.append(tenant)
+                continue
+            self.schedule(tenant, self.skip_quiet(tenant, now, quiet_until))
+            skipped += 1
+        self.flush()
+        self.reschedule(polled, now)
+        return len(polled) + skipped
+
+    def quiet_until(self, tenant: Tenant, now: float) -> Optional[float]:
+        """Возвращает, до какого времени опросы подписки ничего не меняют."""
+        if tenant.errors or tenant.alerts.counts:
+            return None
+        return self.api.quiet_until(tenant, now)
+
+    def skip_quiet(
+        self, tenant: Tenant, now: float, quiet_until: float
+    ) -> float:
+        """Засчитывает опросы без событий и возвращает время следующего."""
+        moment = now
+        while moment < min(quiet_until, self.until):
+            self.api.requests += 1
+            tenant.timestamp = int(moment)
+            moment += self.policy.next_delay(tenant, moment)
+        return moment
+
+    def run(self, until: Optional[float] = None) -> None:
+        """Цикл опроса до until, опросы после until не засчитываются."""
+        self.until = math.inf if until is None else until
+        super().run(until)
+
+
+class Simulation:
+    """Дискретно-событийный прогон движка опроса в виртуальном времени.
+
+    На время прогона журнал и метрики отключены: они меряют реальное
+    время и на тысячах подписок стоят дороже самого опроса. При
+    skip_quiet опросы без событий не выполняются (см. SimulationEngine).
+    """
+
+    def __init__(
+        self,
+        tenants: int,
+        policy: Optional[PollPolicy] = None,
+        review_interval: float = 2 * 24 * 60 * 60,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        start: float = 1_600_000_000,
+        latency: float = 0.0,
+        skip_quiet: bool = True,
+    ) -> None:
+        """Создаёт подписки, имитацию API и движок на виртуальных часах."""
+        self.clock = VirtualClock(start)
+        self.api = SimulatedPracticum(
+            self.clock, review_interval, error_rate, seed, latency
+        )
+        self.bot = CountingBot()
+        self.registry = TenantRegistry()
+        for number in range(tenants):
+            self.registry.add(Tenant(
+                f'token{number}', str(number),
+                timestamp=int(start), last_change=start,
+            ))
+        if skip_quiet:
+            self.engine = SimulationEngine(
+                self.api, self.bot, self.registry,
+                policy=policy, clock=self.clock,
+            )
+        else:
+            self.engine = PollingEngine(
+                self.bot, self.registry, policy=policy, clock=self.clock
+            )
+
+    def run(self, seconds: float) -> dict:
+        """Прогоняет seconds виртуальных секунд и возвращает итоги."""
+        started = time.perf_counter()
+        previous = http_client.install(self.api)
+        breaker = circuit.register(
+            homework.ENDPOINT, CircuitBreaker(clock=self.clock)
+        )
+        logging_level = logging.root.manager.disable
+        logging.disable(logging.CRITICAL)
+        try:
+            with metrics.disabled():
+                self.engine.run(until=self.clock.time() + seconds)
+        finally:
+            logging.disable(logging_level)
+            http_client.install(previous)
+            circuit.register(homework.ENDPOINT, breaker)
+        return {
+            'tenants': len(self.registry),
+            'simulated_seconds': seconds,
+            'api_requests': self.api.requests,
+            'status_changes': self.api.changes,
+            'notifications': self.bot.sent,
+            'wall_seconds': round(time.perf_counter() - started, 3),
+        }
+
+
+def main() -> None:
+    """Запускает симуляцию из командной строки."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--weeks', type=float, default=1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    simulation = Simulation(
+        args.tenants, error_rate=args.error_rate, seed=args.seed,
+        latency=args.latency,
+    )
+    print(json.dumps(simulation.run(args.weeks * SECONDS_IN_WEEK)))
+
+
+if __name__ == '__main__':
+    main()
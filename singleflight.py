@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+import metrics
+from startup import LazyModule
+
+asyncio = LazyModule('asyncio')
+
+Result = TypeVar('Result')
+
+
+class SingleFlight:
+    """Склеивает одновременные одинаковые вызовы в один.
+
+    Первый вызов с ключом выполняет функцию, остальные ждут его
+    результата или исключения. После завершения ключ освобождается,
+    и следующий вызов выполняется заново. Future создаётся только
+    для вызовов, которым есть кого ждать.
+    """
+
+    def __init__(self) -> None:
+        """Создаёт пустую таблицу выполняющихся вызовов."""
+        self.shared = 0
+        self._calls: Dict[Hashable, Optional[Future]] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Result],
+        timeout: Optional[float] = None,
+    ) -> Result:
+        """Возвращает результат function, общий для вызовов с key.
+
+        Ожидающий чужого результата вызов ждёт не дольше timeout секунд
+        и получает concurrent.futures.TimeoutError.
+        """
+        with self._lock:
+            leader = key not in self._calls
+            if leader:
+                self._calls[key] = None
+            else:
+                future = self._calls[key]
+                if future is None:
+                    future = self._calls[key] = Future()
+                self.shared += 1
+        if not leader:
+            metrics.COALESCED_REQUESTS.inc()
+            return future.result(timeout)
+        try:
+            result = function()
+        except BaseException as error:
+            future = self._forget(key)
+            if future is not None:
+                future.set_exception(error)
+            raise
+        future = self._forget(key)
+        if future is not None:
+            future.set_result(result)
+        return result
+
+    def _forget(self, key: Hashable) -> Optional[Future]:
+        with self._lock:
+            return self._calls.pop(key)
+
+
+class AsyncSingleFlight:
+    """Склеивает одновременные одинаковые корутины одного цикла событий."""
+
+    def __init__(self) -> None:
+        """Создаёт пустую таблицу выполняющихся вызовов."""
+        self.shared = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Awaitable[Result]],
+        timeout: Optional[float] = None,
+    ) -> Result:
+        """Возвращает результат function(), общий для вызовов с key.
+
+        Ожидающий чужого результата вызов ждёт не дольше timeout секунд
+        и получает asyncio.TimeoutError.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            metrics.COALESCED_REQUESTS.inc()
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            del self._calls[key]
+            future.cancel()
+            raise
+        except BaseException as error:
+            del self._calls[key]
+            future.set_exception(error)
+            future.exception()
+            raise
+        del self._calls[key]
+        future.set_result(result)
+        return result
@@ -0,0 +1,82 @@
+import functools
+import subprocess
+import sys
+from types import ModuleType
+from typing import List, Optional, TextIO, Tuple
+
+LAZY_MODULES: List['LazyModule'] = []
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту.
+
+    Подмены атрибутов настоящего модуля, например в тестах, видны
+    и через него.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Запоминает имя модуля, не импортируя его."""
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        LAZY_MODULES.append(self)
+
+    def load(self) -> ModuleType:
+        """Импортирует модуль, если это ещё не сделано."""
+        if self._module is None:
+            __import__(self._name)
+            self._module = sys.modules[self._name]
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        """Возвращает атрибут настоящего модуля."""
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        """Показывает имя модуля и загружен ли он."""
+        state = 'загружен' if self._module is not None else 'не загружен'
+        return f'<ленивый модуль {self._name}, {state}>'
+
+
+@functools.lru_cache(maxsize=None)
+def load_env() -> bool:
+    """Читает .env в окружение один раз за процесс."""
+    from dotenv import load_dotenv
+
+    return load_dotenv()
+
+
+def load_all() -> None:
+    """Импортирует все ленивые модули, как это сделает первый опрос."""
+    for module in LAZY_MODULES:
+        module.load()
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Замеряет импорт module в отдельном процессе с -X importtime.
+
+    Возвращает модули верхнего уровня: имя, собственное и полное время
+    импорта в микросекундах. Ленивые модули загружаются после module.
+    """
+    code = f'import {module}, startup; startup.load_all()'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit() and not name.startswith('  '):
+            times.append((name.strip(), int(own), int(total)))
+    return times
+
+
+def print_profile(module: str, stream: TextIO = sys.stdout) -> None:
+    """Печатает, сколько миллисекунд занимает импорт каждой части."""
+    times = import_times(module)
+    stream.write(f'{"всего, мс":>10} {"своё, мс":>10}  модуль\n')
+    for name, own, total in sorted(times, key=lambda row: -row[2]):
+        stream.write(f'{total / 1000:>10.1f} {own / 1000:>10.1f}  {name}\n')
+    overall = sum(total for _, _, total in times) / 1000
+    stream.write(f'{overall:>10.1f} {"":>10}  итого\n')
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+from typing import Iterable
+
+from tenants import Tenant
+
+LOAD_BATCH = 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenants (
+    practicum_token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (practicum_token, chat_id)
+);
+CREATE TABLE IF NOT EXISTS homeworks (
+    practicum_token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    homework_id NOT NULL,
+    status TEXT,
+    date_updated TEXT,
+    PRIMARY KEY (practicum_token, chat_id, homework_id)
+);
+"""
+
+
+class StateStore:
+    """Хранит состояние подписок в SQLite между перезапусками."""
+
+    def __init__(self, path: str) -> None:
+        """Открывает базу и создаёт таблицы, если их нет."""
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    def load(self, tenants: Iterable[Tenant]) -> int:
+        """Восстанавливает сохранённое состояние подписок.
+
+        Читает только строки переданных подписок, пачками по LOAD_BATCH.
+        """
+        by_key = {tenant.key: tenant for tenant in tenants}
+        keys = list(by_key)
+        tenant_rows = []
+        homework_rows = []
+        with self._lock:
+            for start in range(0, len(keys), LOAD_BATCH):
+                batch = keys[start:start + LOAD_BATCH]
+                condition = (
+                    '(practicum_token, chat_id) IN (VALUES '
+                    + ', '.join(['(?, ?)'] * len(batch)) + ')'
+                )
+                parameters = [value for key in batch for value in key]
+                tenant_rows.extend(self._connection.execute(
+                    'SELECT practicum_token, chat_id, timestamp, message '
+                    f'FROM tenants WHERE {condition}', parameters
+                ))
+                homework_rows.extend(self._connection.execute(
+                    'SELECT practicum_token, chat_id, homework_id, status, '
+                    f'date_updated FROM homeworks WHERE {condition}',
+                    parameters,
+                ))
+        for token, chat_id, timestamp, message in tenant_rows:
+            tenant = by_key[(token, chat_id)]
+            tenant.timestamp = timestamp
+            tenant.message = message
+        for token, chat_id, homework_id, status, date_updated in homework_rows:
+            tenant = by_key[(token, chat_id)]
+            tenant.homeworks[homework_id] = (status, date_updated)
+            if status == 'reviewing' or tenant.status is None:
+                tenant.status = status
+        for tenant in by_key.values():
+            tenant.dirty.clear()
+        return len(tenant_rows)
+
+    def save(self, tenants: Iterable[Tenant]) -> None:
+        """Записывает изменения подписок одной транзакцией."""
+        tenant_rows = []
+        homework_rows = []
+        for tenant in tenants:
+            tenant_rows.append((*tenant.key, tenant.timestamp, tenant.message))
+            homework_rows.extend(
+                (*tenant.key, key, *tenant.homeworks[key])
+                for key in tenant.dirty
+            )
+            tenant.dirty.clear()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO tenants VALUES (?, ?, ?, ?)',
+                tenant_rows,
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO homeworks VALUES (?, ?, ?, ?, ?)',
+                homework_rows,
+            )
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,340 @@
+import calendar
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+NEXT_STATUSES = {
+    'reviewing': ('approved', 'rejected'),
+    'rejected': ('reviewing',),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Передаёт запросы заглушке, к которой привязан сервер."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        """Считает новое соединение."""
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def send_json(
+        self, status: int, data: object, headers: Optional[dict] = None
+    ) -> None:
+        """Отправляет ответ с телом в JSON."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, headers: dict) -> None:
+        """Отправляет ответ 304 без тела."""
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def params(self) -> Tuple[str, dict]:
+        """Возвращает путь и параметры запроса из строки и тела."""
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+        return parts.path, params
+
+    def handle_stub(self) -> None:
+        """Выдерживает задержку и передаёт запрос заглушке."""
+        number = self.server.stub.count_request()
+        self.server.stub.wait(number)
+        path, params = self.params()
+        self.server.stub.handle(self, path, params)
+
+    do_GET = handle_stub
+    do_POST = handle_stub
+
+    def log_message(self, format: str, *args) -> None:
+        """Не пишет запросы в stderr."""
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """HTTP-сервер заглушки с длинной очередью соединений."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubServer:
+    """Основа локальных HTTP-заглушек, работающих в фоновом потоке.
+
+    latency — задержка ответа в секундах или функция от номера запроса,
+    error_rate — доля запросов, на которые приходит ответ 500.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[int], float]] = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Создаёт сервер на свободном порту 127.0.0.1."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.server = StubHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.stub = self
+        self.requests = 0
+        self.lock = self.server.lock
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+
+    @property
+    def base_url(self) -> str:
+        """Адрес сервера."""
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def connections(self) -> int:
+        """Число принятых соединений."""
+        return self.server.connections
+
+    def count_request(self) -> int:
+        """Считает запрос и возвращает его номер."""
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+    def wait(self, number: int) -> None:
+        """Выдерживает задержку ответа на запрос с номером number."""
+        latency = self.latency
+        if callable(latency):
+            latency = latency(number)
+        if latency:
+            time.sleep(latency)
+
+    def chance(self, rate: float) -> bool:
+        """Возвращает True с вероятностью rate."""
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def handle(
+        self, handler: StubHandler, path: str, params: dict
+    ) -> None:
+        """Отвечает на запрос."""
+        raise NotImplementedError
+
+    def __enter__(self) -> 'StubServer':
+        """Запускает сервер."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Останавливает сервер и закрывает сокет."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PracticumStub(StubServer):
+    """Локальный сервер, отвечающий как `homework_statuses/`.
+
+    У каждого токена свои работы. С вероятностью churn запрос переводит
+    одну работу токена в следующий статус проверки. Как и настоящий API,
+    сервер возвращает только работы, обновлённые после from_date. С
+    validators ответы несут слабый ETag и Last-Modified возвращённых работ,
+    а на условный запрос с прежним ETag приходит 304.
+    """
+
+    PATH = '/api/user_api/homework_statuses/'
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[int], float]] = 0.0,
+        error_rate: float = 0.0,
+        churn: float = 0.0,
+        seed: Optional[int] = None,
+        validators: bool = False,
+    ) -> None:
+        """Создаёт сервер без работ."""
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.churn = churn
+        self.validators = validators
+        self.not_modified = 0
+        self.homeworks = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def url(self) -> str:
+        """Адрес эндпоинта статусов работ."""
+        return self.base_url + self.PATH
+
+    def add_homework(
+        self,
+        token: str,
+        status: str = 'reviewing',
+        updated: Optional[float] = None,
+    ) -> dict:
+        """Добавляет работу токену и возвращает её."""
+        updated = int(time.time() if updated is None else updated)
+        homework = {
+            'id': next(self._ids),
+            'homework_name': f'hw{len(self.homeworks.get(token, []))}.zip',
+            'reviewer_comment': '',
+            'lesson_name': 'Проект спринта',
+        }
+        self._touch(homework, status, updated)
+        self.homeworks.setdefault(token, []).append(homework)
+        return homework
+
+    def _touch(self, homework: dict, status: str, updated: int) -> None:
+        homework['status'] = status
+        homework['updated'] = updated
+        homework['date_updated'] = time.strftime(
+            '%Y-%m-%dT%H:%M:%SZ', time.gmtime(updated)
+        )
+
+    def _churn(self, token: str, now: int) -> None:
+        open_homeworks = [
+            homework for homework in self.homeworks.get(token, [])
+            if homework['status'] in NEXT_STATUSES
+        ]
+        if not open_homeworks:
+            self.add_homework(token, updated=now)
+            return
+        homework = self.random.choice(open_homeworks)
+        status = self.random.choice(NEXT_STATUSES[homework['status']])
+        self._touch(homework, status, now)
+
+    def handle(
+        self, handler: StubHandler, path: str, params: dict
+    ) -> None:
+        """Отвечает списком работ токена из заголовка Authorization."""
+        authorization = handler.headers.get('Authorization', '')
+        if path != self.PATH:
+            return handler.send_json(HTTPStatus.NOT_FOUND, {})
+        if not authorization.startswith('OAuth '):
+            return handler.send_json(HTTPStatus.UNAUTHORIZED, {
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+            })
+        if self.chance(self.error_rate):
+            return handler.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {})
+        token = authorization[len('OAuth '):]
+        now = int(time.time())
+        from_date = int(params.get('from_date') or 0)
+        with self.lock:
+            if self.churn and self.random.random() < self.churn:
+                self._churn(token, now)
+            homeworks = [
+                {key: value for key, value in homework.items()
+                 if key != 'updated'}
+                for homework in self.homeworks.get(token, [])
+                if homework['updated'] >= from_date
+            ]
+        headers = self._validators(homeworks) if self.validators else {}
+        if headers and handler.headers.get('If-None-Match') == headers['ETag']:
+            with self.lock:
+                self.not_modified += 1
+            return handler.send_not_modified(headers)
+        handler.send_json(HTTPStatus.OK, {
+            'homeworks': homeworks, 'current_date': now,
+        }, headers)
+
+    def _validators(self, homeworks: list) -> dict:
+        digest = hashlib.sha1(
+            json.dumps(homeworks, sort_keys=True).encode()
+        ).hexdigest()
+        updated = max(
+            (calendar.timegm(time.strptime(
+                homework['date_updated'], '%Y-%m-%dT%H:%M:%SZ'
+            )) for homework in homeworks),
+            default=0,
+        )
+        return {
+            'ETag': f'W/"{digest}"',
+            'Last-Modified': formatdate(updated, usegmt=True),
+        }
+
+
+class TelegramStub(StubServer):
+    """Локальный сервер, отвечающий как `sendMessage` Bot API.
+
+    flood_rate — доля запросов, на которые приходит 429 с retry_after.
+    Принятые сообщения хранятся в messages. Бот направляется на сервер
+    через `apihelper.API_URL = stub.api_url`.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[int], float]] = 0.0,
+        error_rate: float = 0.0,
+        flood_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Создаёт сервер без сообщений."""
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.messages = []
+        self._message_ids = itertools.count(1)
+
+    @property
+    def api_url(self) -> str:
+        """Шаблон адреса Bot API для apihelper.API_URL."""
+        return self.base_url + '/bot{0}/{1}'
+
+    def handle(
+        self, handler: StubHandler, path: str, params: dict
+    ) -> None:
+        """Принимает сообщение или отвечает ошибкой."""
+        if not path.endswith('/sendMessage'):
+            return handler.send_json(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found',
+            })
+        if self.chance(self.flood_rate):
+            return handler.send_json(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False,
+                'error_code': 429,
+                'description': (
+                    f'Too Many Requests: retry after {self.retry_after}'
+                ),
+                'parameters': {'retry_after': self.retry_after},
+            })
+        if self.chance(self.error_rate):
+            return handler.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {
+                'ok': False, 'error_code': 500,
+                'description': 'Internal Server Error',
+            })
+        chat_id, text = params.get('chat_id'), params.get('text')
+        with self.lock:
+            self.messages.append((chat_id, text))
+            message_id = next(self._message_ids)
+        handler.send_json(HTTPStatus.OK, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': text,
+        }})
@@ -0,0 +1,125 @@
+import json
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from alerts import ErrorDigest
+from api_cache import AnswerCache
+
+
+@dataclass
+class Tenant:
+    """Подписка: токен Практикума и чат для уведомлений."""
+
+    practicum_token: str
+    chat_id: str
+    timestamp: int = field(default_factory=lambda: int(time.time()))
+    message: str = ''
+    status: Optional[str] = None
+    errors: int = 0
+    last_change: float = field(default_factory=time.time)
+    homeworks: Dict[Hashable, Tuple[str, str]] = field(default_factory=dict)
+    dirty: Set[Hashable] = field(default_factory=set)
+    alerts: ErrorDigest = field(
+        default_factory=ErrorDigest, compare=False, repr=False
+    )
+    cache: AnswerCache = field(
+        default_factory=AnswerCache, compare=False, repr=False
+    )
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Возвращает ключ подписки в реестре."""
+        return self.practicum_token, self.chat_id
+
+    @property
+    def headers(self) -> dict:
+        """Возвращает заголовки запроса к API Практикума."""
+        return {'Authorization': f'OAuth {self.practicum_token}'}
+
+    @staticmethod
+    def homework_key(homework: dict) -> Hashable:
+        """Возвращает ключ работы в индексе статусов."""
+        return homework.get('id', homework.get('homework_name'))
+
+    def diff(self, homeworks: List[dict]) -> List[dict]:
+        """Возвращает работы, статус которых отличается от индекса."""
+        return [
+            homework for homework in homeworks
+            if self.homeworks.get(self.homework_key(homework)) != (
+                homework.get('status'), homework.get('date_updated')
+            )
+        ]
+
+    def remember(self, homework: dict) -> None:
+        """Записывает статус работы в индекс."""
+        status = homework.get('status')
+        key = self.homework_key(homework)
+        self.homeworks[key] = (status, homework.get('date_updated'))
+        self.dirty.add(key)
+        if status == 'reviewing' or self.status != 'reviewing':
+            self.status = status
+        elif not any(
+            seen == 'reviewing' for seen, _ in self.homeworks.values()
+        ):
+            self.status = status
+
+
+current_tenant: ContextVar[Optional[Tenant]] = ContextVar(
+    'current_tenant', default=None
+)
+
+
+class TenantRegistry:
+    """Реестр подписок, которые опрашивает один процесс."""
+
+    def __init__(self) -> None:
+        """Создаёт пустой реестр."""
+        self._tenants: Dict[Tuple[str, str], Tenant] = {}
+        self._alerts: Dict[str, ErrorDigest] = {}
+
+    def __len__(self) -> int:
+        """Возвращает число подписок."""
+        return len(self._tenants)
+
+    def __iter__(self) -> Iterator[Tenant]:
+        """Перебирает снимок подписок."""
+        return iter(list(self._tenants.values()))
+
+    def __contains__(self, tenant: Tenant) -> bool:
+        """Проверяет, есть ли подписка с тем же ключом."""
+        return tenant.key in self._tenants
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tenant]:
+        """Возвращает подписку по ключу."""
+        return self._tenants.get(key)
+
+    def add(self, tenant: Tenant) -> Tenant:
+        """Добавляет подписку, повторное добавление ничего не меняет.
+
+        Подписки одного чата получают общую сводку ошибок, чтобы в чат
+        уходило не больше одной сводки за окно.
+        """
+        added = self._tenants.setdefault(tenant.key, tenant)
+        if added is tenant:
+            tenant.alerts = self._alerts.setdefault(
+                tenant.chat_id, tenant.alerts
+            )
+        return added
+
+    def remove(self, tenant: Tenant) -> None:
+        """Удаляет подписку из реестра."""
+        self._tenants.pop(tenant.key, None)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'TenantRegistry':
+        """Загружает подписки из JSON-файла со списком объектов."""
+        registry = cls()
+        with open(path, encoding='utf-8') as file:
+            for item in json.load(file):
+                registry.add(Tenant(
+                    practicum_token=item['practicum_token'],
+                    chat_id=str(item['chat_id']),
+                ))
+        return registry
@@ -1,6 +1,7 @@
 import logging
 import signal
 import re
+import threading
 from collections import namedtuple
 from contextlib import contextmanager
 from functools import wraps
@@ -8,6 +9,8 @@ from http import HTTPStatus
 from inspect import signature
 from types import ModuleType
 
+import requests
+
 
 def get_clean_source_code(raw_src: str) -> str:
     comment_pattern = re.compile(r'\s*#[^\n]*')
@@ -116,6 +119,31 @@ class MockTelegramBot:
         self.text = text
 
 
+class RecordingBot:
+    """Bot that records sent messages or fails like a lost connection."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.event = threading.Event()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.fail:
+            raise requests.ConnectionError('нет сети')
+        self.sent.append((chat_id, text))
+        self.event.set()
+
+
+class FakeClock:
+    """Monotonic clock that moves only when `now` is set."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 class BreakInfiniteLoop(BaseException):
     pass
 
@@ -0,0 +1,122 @@
+from alerts import ErrorDigest, fingerprint
+from clock import VirtualClock
+from exceptions import ParseError, RequestError
+from tenants import Tenant, TenantRegistry
+from stub_servers import PracticumStub
+
+
+def raise_request_error(text, status_code=None):
+    try:
+        raise ConnectionError(text)
+    except ConnectionError:
+        return RequestError(text, status_code=status_code)
+
+
+def test_fingerprint_ignores_message_text():
+    first = raise_request_error('params 1')
+    second = raise_request_error('params 2')
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(RequestError('a', status_code=500)) != fingerprint(
+        RequestError('a', status_code=502)
+    )
+
+
+def test_digest_sends_one_summary_per_window():
+    digest = ErrorDigest(window=60)
+    assert digest.add(RequestError('first', 500), now=0) is not None
+    digest.mark_sent(0)
+    assert digest.add(RequestError('second', 500), now=10) is None
+    assert digest.add(ParseError('broken'), now=20) is None
+    summary = digest.add(RequestError('third', 500), now=60)
+    assert summary.splitlines() == [
+        'Возникли ошибки ошибки: RequestError, код ответа 500 '
+        '(повторилась 2 раз)',
+        'Возникли ошибки ошибки: ParseError',
+    ]
+
+
+def test_summary_does_not_include_error_text():
+    digest = ErrorDigest(window=60)
+    summary = digest.add(raise_request_error(
+        "{'headers': {'Authorization': 'OAuth secret'}}", status_code=502
+    ), now=0)
+    assert 'secret' not in summary
+    assert summary == (
+        'Возникли ошибки ошибки: RequestError, код ответа 502'
+    )
+
+
+def test_tenants_of_one_chat_share_digest():
+    registry = TenantRegistry()
+    first = registry.add(Tenant('student', 'group'))
+    second = registry.add(Tenant('mentor', 'group'))
+    other = registry.add(Tenant('student', 'private'))
+    assert first.alerts is second.alerts
+    assert first.alerts is not other.alerts
+
+
+def test_unsent_summary_is_kept():
+    digest = ErrorDigest(window=60)
+    digest.add(RequestError('first', 500), now=0)
+    summary = digest.add(RequestError('second', 500), now=1)
+    assert 'повторилась 2 раз' in summary
+
+
+def test_flush_sends_buffered_errors_after_window():
+    digest = ErrorDigest(window=60)
+    assert digest.flush(now=0) is None
+    digest.add(RequestError('first', 500), now=0)
+    digest.mark_sent(0)
+    digest.add(ParseError('second'), now=10)
+    assert digest.flush(now=59) is None
+    assert 'ParseError' in digest.flush(now=60)
+    digest.mark_sent(60)
+    assert digest.flush(now=200) is None
+
+
+def test_successful_poll_flushes_buffered_errors(
+    monkeypatch, homework_module
+):
+    class Bot:
+        def __init__(self):
+            self.sent = []
+
+        def send_message(self, chat_id, text, **kwargs):
+            self.sent.append(text)
+
+    bot = Bot()
+    clock = VirtualClock(1000)
+    tenant = Tenant('token', 'chat', timestamp=0)
+    tenant.alerts = ErrorDigest(window=60)
+    with PracticumStub(error_rate=1.0) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        homework_module.poll_tenant(bot, tenant, clock)
+        clock.sleep(10)
+        homework_module.poll_tenant(bot, tenant, clock)
+        assert len(bot.sent) == 1
+        stub.error_rate = 0
+        clock.sleep(60)
+        homework_module.poll_tenant(bot, tenant, clock)
+    assert len(bot.sent) == 2
+    assert 'код ответа 500' in bot.sent[1]
+    assert not tenant.alerts.counts
+
+
+def test_errors_do_not_replace_status_message(monkeypatch, homework_module):
+    class Bot:
+        def __init__(self):
+            self.sent = []
+
+        def send_message(self, chat_id, text, **kwargs):
+            self.sent.append(text)
+
+    bot = Bot()
+    tenant = Tenant('token', 'chat', timestamp=0)
+    tenant.message = 'Статус работы'
+    with PracticumStub(error_rate=1.0) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        for _ in range(3):
+            homework_module.poll_tenant(bot, tenant)
+    assert len(bot.sent) == 1
+    assert tenant.message == 'Статус работы'
+    assert tenant.errors == 3
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import time
+from http import HTTPStatus
+
+import aiohttp
+import pytest
+import requests
+
+import async_mode
+import metrics
+from api_cache import UNCHANGED, AnswerCache
+from exceptions import SendError
+from tenants import Tenant, current_tenant
+from tests.check_utils import RecordingBot
+from stub_servers import PracticumStub
+
+
+class BytesResponse:
+    def __init__(self, data):
+        self.status_code = HTTPStatus.OK
+        self.headers = {}
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+@pytest.fixture
+def same_body(monkeypatch, data_with_new_hw_status):
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(kwargs['headers'])
+        return BytesResponse(dict(
+            data_with_new_hw_status, current_date=100 + len(calls)
+        ))
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    return calls
+
+
+@pytest.fixture
+def tenant():
+    tenant = Tenant('token', 'chat', timestamp=100)
+    context = current_tenant.set(tenant)
+    yield tenant
+    current_tenant.reset(context)
+
+
+def test_request_headers_after_commit():
+    cache = AnswerCache()
+    cache.unchanged(HTTPStatus.OK, {'ETag': '"a"'}, {'homeworks': []})
+    assert cache.request_headers() == {}
+    cache.commit()
+    assert cache.request_headers() == {'If-None-Match': '"a"'}
+
+
+def test_only_homeworks_are_compared():
+    cache = AnswerCache()
+    cache.unchanged(HTTPStatus.OK, {}, {'homeworks': [], 'current_date': 1})
+    cache.commit()
+    assert cache.unchanged(
+        HTTPStatus.OK, {}, {'homeworks': [], 'current_date': 2}
+    )
+    assert not cache.unchanged(
+        HTTPStatus.OK, {}, {'homeworks': [{'id': 1}], 'current_date': 2}
+    )
+    assert not cache.unchanged(HTTPStatus.OK, {}, [])
+
+
+def test_same_body_is_not_parsed_again(
+    monkeypatch, homework_module, tenant, same_body
+):
+    checked = []
+    check_response = homework_module.check_response
+    monkeypatch.setattr(homework_module, 'check_response', lambda response: (
+        checked.append(response) or check_response(response)
+    ))
+    bot = RecordingBot()
+    unchanged = metrics.API_CACHE.value('unchanged')
+    homework_module.poll_tenant(bot, tenant)
+    homework_module.poll_tenant(bot, tenant)
+    assert len(same_body) == 2
+    assert len(checked) == 1
+    assert len(bot.sent) == 1
+    assert metrics.API_CACHE.value('unchanged') == unchanged + 1
+
+
+def test_failed_send_is_not_cached(homework_module, tenant, same_body):
+    with pytest.raises(SendError):
+        homework_module.notify_status(
+            RecordingBot(fail=True), tenant,
+            homework_module.get_api_answer(tenant.timestamp), 0,
+        )
+    assert homework_module.get_api_answer(tenant.timestamp) is not UNCHANGED
+
+
+def test_conditional_request_gets_not_modified(
+    monkeypatch, homework_module, tenant
+):
+    with PracticumStub(validators=True) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        stub.add_homework('token', updated=200)
+        answer = homework_module.get_api_answer(tenant.timestamp)
+        assert len(answer['homeworks']) == 1
+        tenant.cache.commit()
+        assert homework_module.get_api_answer(tenant.timestamp) is UNCHANGED
+        assert stub.not_modified == 1
+        stub.add_homework('token', updated=300)
+        answer = homework_module.get_api_answer(tenant.timestamp)
+        assert len(answer['homeworks']) == 2
+
+
+def test_async_conditional_request(monkeypatch, homework_module, tenant):
+    async def answer():
+        async with aiohttp.ClientSession() as session:
+            return await async_mode.get_api_answer_async(
+                session, tenant.timestamp
+            )
+
+    with PracticumStub(validators=True) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        stub.add_homework('token', updated=200)
+        assert len(asyncio.run(answer())['homeworks']) == 1
+        tenant.cache.commit()
+        assert asyncio.run(answer()) is UNCHANGED
+        assert stub.not_modified == 1
+
+
+def test_not_modified_while_time_advances(
+    monkeypatch, homework_module, tenant
+):
+    bot = RecordingBot()
+    with PracticumStub(validators=True) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        stub.add_homework('token', updated=time.time() + 3600)
+        homework_module.poll_tenant(bot, tenant)
+        first = tenant.timestamp
+        homework_module.poll_tenant(bot, tenant)
+        tenant.timestamp += 60
+        homework_module.poll_tenant(bot, tenant)
+    assert first > 100
+    assert stub.not_modified == 2
+    assert len(bot.sent) == 1
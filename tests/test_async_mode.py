@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+import async_mode
+from exceptions import RequestError
+from outbox import Outbox
+from scheduler import PollPolicy
+from tenants import Tenant, TenantRegistry
+from tests.check_utils import FakeClock
+from stub_servers import PracticumStub, TelegramStub
+
+
+@pytest.fixture
+def stubs(monkeypatch, homework_module):
+    with PracticumStub(latency=0.1) as practicum, TelegramStub() as telegram:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', practicum.url)
+        monkeypatch.setattr(asyncio_helper, 'API_URL', telegram.api_url)
+        yield practicum, telegram
+
+
+def run_engine(registry, concurrency=100):
+    async def scenario():
+        bot = AsyncTeleBot(token='1234:abcdefg')
+        async with aiohttp.ClientSession() as session:
+            engine = async_mode.AsyncPollingEngine(
+                bot, registry, session, policy=PollPolicy(600, spread=False),
+                concurrency=concurrency,
+            )
+            try:
+                return await engine.run_pending(time.time() + 1)
+            finally:
+                await bot.close_session()
+
+    return asyncio.run(scenario())
+
+
+def test_tenants_are_polled_concurrently(stubs):
+    practicum, telegram = stubs
+    registry = TenantRegistry()
+    for number in range(40):
+        practicum.add_homework(f'token{number}', updated=10)
+        registry.add(Tenant(f'token{number}', str(number), timestamp=0))
+    started = time.monotonic()
+    assert run_engine(registry) == 40
+    assert time.monotonic() - started < 1
+    assert practicum.requests == 40
+    assert len(telegram.messages) == 40
+    assert all(tenant.timestamp > 0 for tenant in registry)
+
+
+def test_same_token_is_requested_once(stubs):
+    practicum, telegram = stubs
+    practicum.add_homework('student', updated=10)
+    registry = TenantRegistry()
+    for chat in ('1', '2', '3'):
+        registry.add(Tenant('student', chat, timestamp=0))
+    run_engine(registry)
+    assert practicum.requests == 1
+    assert sorted(chat for chat, _ in telegram.messages) == ['1', '2', '3']
+
+
+def test_api_error_is_request_error(monkeypatch, homework_module):
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            return await async_mode.get_api_answer_async(session, 0)
+
+    with PracticumStub(error_rate=1.0) as practicum:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', practicum.url)
+        with pytest.raises(RequestError):
+            asyncio.run(scenario())
+
+
+class AsyncFlakyBot:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        self.sent.append((chat_id, text))
+
+
+def flood_error(retry_after):
+    return asyncio_helper.ApiTelegramException('sendMessage', None, {
+        'error_code': 429, 'description': 'Too Many Requests',
+        'parameters': {'retry_after': retry_after},
+    })
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_async_queue_waits_retry_after_for_its_chat():
+    clock = FakeClock()
+    bot = AsyncFlakyBot({'a': [flood_error(7)]})
+
+    async def scenario():
+        queue = async_mode.AsyncMessageQueue(bot, clock=clock)
+        await queue.send_message('a', 'a0')
+        await queue.send_message('b', 'b0')
+        queue.deliver_due()
+        await settle()
+        assert bot.sent == [('b', 'b0')]
+        assert (queue.retried, len(queue)) == (1, 1)
+        assert queue.deliver_due() == 7
+        clock.now = 7
+        queue.deliver_due()
+        await settle()
+        assert queue.deliver_due() is None
+
+    asyncio.run(scenario())
+    assert bot.sent == [('b', 'b0'), ('a', 'a0')]
+
+
+def test_engine_sends_through_queue_and_outbox(stubs, tmp_path):
+    practicum, telegram = stubs
+    practicum.add_homework('student', updated=10)
+    registry = TenantRegistry()
+    registry.add(Tenant('student', '1', timestamp=0))
+    path = str(tmp_path / 'outbox.log')
+    outbox = Outbox(path)
+
+    async def scenario():
+        bot = AsyncTeleBot(token='1234:abcdefg')
+        outbound = async_mode.AsyncMessageQueue(bot, outbox=outbox)
+        outbound.start()
+        async with aiohttp.ClientSession() as session:
+            engine = async_mode.AsyncPollingEngine(
+                outbound, registry, session,
+                policy=PollPolicy(600, spread=False),
+            )
+            try:
+                await engine.run_pending(time.time() + 1)
+                await async_mode.stop_async_engine(
+                    engine, outbound, outbox, timeout=1
+                )
+            finally:
+                await bot.close_session()
+
+    asyncio.run(scenario())
+    assert [chat for chat, _ in telegram.messages] == ['1']
+    assert Outbox(path).pending() == []
+
+
+def test_stop_cancels_polls_waiting_for_slot(stubs):
+    practicum, _ = stubs
+    registry = TenantRegistry()
+    for number in range(3):
+        practicum.add_homework(f'token{number}', updated=10)
+        registry.add(Tenant(f'token{number}', str(number), timestamp=0))
+
+    class StoppingBot:
+        engine = None
+
+        async def send_message(self, chat_id=None, text=None, **kwargs):
+            self.engine.stop()
+
+    bot = StoppingBot()
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            bot.engine = async_mode.AsyncPollingEngine(
+                bot, registry, session,
+                policy=PollPolicy(600, spread=False), concurrency=1,
+            )
+            return await bot.engine.run_pending(time.time() + 1)
+
+    assert asyncio.run(scenario()) == 1
+    assert practicum.requests == 1
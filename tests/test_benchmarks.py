@@ -0,0 +1,19 @@
+import json
+
+import pytest
+
+from benchmarks import bench_pipeline
+
+
+@pytest.mark.timeout(30)
+def test_pipeline_benchmark_runs(tmp_path, monkeypatch):
+    output = tmp_path / 'pipeline.json'
+    monkeypatch.setattr('sys.argv', [
+        'bench_pipeline', '--tenants', '1', '3', '--rounds', '1',
+        '--output', str(output),
+    ])
+    bench_pipeline.main()
+    results = json.loads(output.read_text())['results']
+    assert [result['tenants'] for result in results] == [1, 3]
+    assert all(result['polls'] == result['tenants'] for result in results)
+    assert all('delivery_latency_p99_ms' in result for result in results)
@@ -52,7 +52,7 @@ class TestHomework:
         'check_response': 1,
         'parse_status': 1,
         'check_tokens': 0,
-        'main': 0
+        'main': 1
     }
     RETRY_PERIOD = 600
     INVALID_RESPONSES = {
@@ -547,7 +547,7 @@ class TestHomework:
         )
 
         time_sleep_pattern = re.compile(
-            r'(\# *)?(time\.sleep\( *[\w\d=_\-\'\"]* *\))'
+            r'(\# *)?((time|clock)\.sleep\( *[\w\d=_\-\'\"]* *\))'
         )
         search_result = re.search(time_sleep_pattern, main_source)
         assert search_result, (
@@ -556,6 +556,8 @@ class TestHomework:
 
         def sleep_to_interrupt(secs):
             caller = inspect.stack()[1].function
+            if caller == 'sleep':
+                caller = inspect.stack()[2].function
             if caller != 'main':
                 old_sleep(secs)
                 return
@@ -599,6 +601,13 @@ class TestHomework:
             'get',
             mock_response_get_with_new_status
         )
+        monkeypatch.setattr(
+            requests.Session,
+            'get',
+            lambda session, *args, **kwargs: (
+                mock_response_get_with_new_status(*args, **kwargs)
+            )
+        )
         if platform.system() != 'Windows':
             homework_module.main = (
                 check_utils.with_timeout(homework_module.main)
@@ -0,0 +1,117 @@
+import pytest
+
+import circuit
+import http_client
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from clock import VirtualClock
+from exceptions import CircuitOpenError, RequestError
+from tenants import Tenant
+from stub_servers import PracticumStub
+
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    monkeypatch.setattr(circuit, '_breakers', {})
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = VirtualClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    for _ in range(3):
+        breaker.before_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_half_open_limits_probes():
+    clock = VirtualClock()
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=10, half_open_probes=1, clock=clock
+    )
+    breaker.before_request()
+    breaker.record_failure()
+    clock.sleep(10)
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.sleep(10)
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+    breaker.before_request()
+
+
+@pytest.fixture
+def failing_stub(monkeypatch, homework_module):
+    with PracticumStub(error_rate=1.0) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        circuit.register(
+            stub.url, CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+        yield stub
+
+
+def test_open_circuit_short_circuits_all_tenants(failing_stub, homework_module):
+    class Bot:
+        def __init__(self):
+            self.sent = []
+
+        def send_message(self, chat_id, text, **kwargs):
+            self.sent.append(text)
+
+    bot = Bot()
+    tenants = [Tenant(f'token{n}', str(n), timestamp=0) for n in range(5)]
+    for tenant in tenants:
+        homework_module.poll_tenant(bot, tenant)
+    assert failing_stub.requests == 2
+    assert len(bot.sent) == 2
+    assert all(tenant.errors == 1 for tenant in tenants)
+    assert circuit.breaker_for(failing_stub.url).state == OPEN
+
+
+def test_client_errors_do_not_open_circuit(monkeypatch, homework_module):
+    with PracticumStub() as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        monkeypatch.setattr(homework_module, 'HEADERS', {})
+        breaker = circuit.breaker_for(stub.url)
+        for _ in range(breaker.failure_threshold + 1):
+            with pytest.raises(RequestError):
+                homework_module.get_api_answer(0)
+        assert breaker.state == CLOSED
+
+
+def test_unexpected_error_releases_probe(homework_module):
+    class BrokenSession:
+        def get(self, **kwargs):
+            raise ValueError('сломался клиент')
+
+    clock = VirtualClock()
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=10, clock=clock
+    )
+    circuit.register(homework_module.ENDPOINT, breaker)
+    breaker.before_request()
+    breaker.record_failure()
+    clock.sleep(10)
+    previous = http_client.install(BrokenSession())
+    try:
+        with pytest.raises(ValueError):
+            homework_module.get_api_answer(0)
+    finally:
+        http_client.install(previous)
+    assert breaker.state == HALF_OPEN
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from deadline import Deadline
+from exceptions import RequestError, SendError
+from tenants import Tenant
+from tests.check_utils import FakeClock
+from stub_servers import PracticumStub
+
+
+def test_deadline_caps_timeouts():
+    clock = FakeClock()
+    deadline = Deadline(5, clock=clock)
+    assert deadline.timeout(3, 10) == (3, 5)
+    clock.now = 4.5
+    assert deadline.timeout(3, 10) == (0.5, 0.5)
+    assert deadline.send_timeout() == 1
+    clock.now = 5
+    with pytest.raises(RequestError):
+        deadline.timeout(3, 10)
+    with pytest.raises(SendError):
+        deadline.send_timeout()
+
+
+@pytest.fixture
+def slow_stub(monkeypatch, homework_module):
+    with PracticumStub(latency=0.5) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        yield stub
+
+
+def test_slow_api_is_recorded_as_request_error(
+    monkeypatch, slow_stub, homework_module
+):
+    monkeypatch.setattr(homework_module, 'READ_TIMEOUT', 0.1)
+    with pytest.raises(RequestError):
+        homework_module.get_api_answer(0)
+
+
+def test_tick_budget_bounds_poll(monkeypatch, slow_stub, homework_module):
+    class Bot:
+        def send_message(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(homework_module, 'TICK_BUDGET', 0.1)
+    tenant = Tenant('token', 'chat', timestamp=0)
+    started = time.monotonic()
+    homework_module.poll_tenant(Bot(), tenant)
+    assert time.monotonic() - started < 0.4
+    assert tenant.errors == 1
+    assert tenant.timestamp == 0
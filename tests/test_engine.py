@@ -0,0 +1,237 @@
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import tests.check_utils as check_utils
+from engine import PollingEngine, ThreadedPollingEngine
+from scheduler import PollPolicy
+from tenants import Tenant, TenantRegistry, current_tenant
+from stub_servers import PracticumStub
+
+
+@pytest.fixture
+def registry():
+    registry = TenantRegistry()
+    for number in range(3):
+        registry.add(Tenant(
+            practicum_token=f'token{number}',
+            chat_id=f'chat{number}',
+            timestamp=0,
+        ))
+    return registry
+
+
+@pytest.fixture
+def api_calls(monkeypatch, data_with_new_hw_status):
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(kwargs['headers']['Authorization'])
+        return check_utils.MockResponseGET(
+            http_status=HTTPStatus.OK, data=data_with_new_hw_status
+        )
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    return calls
+
+
+def test_registry_ignores_duplicates(registry):
+    assert registry.add(Tenant('token0', 'chat0')) is registry.get(
+        ('token0', 'chat0')
+    )
+    assert len(registry) == 3
+
+
+def test_registry_from_file(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(
+        '[{"practicum_token": "a", "chat_id": 1},'
+        ' {"practicum_token": "b", "chat_id": "2"}]'
+    )
+    registry = TenantRegistry.from_file(str(path))
+    assert [tenant.key for tenant in registry] == [('a', '1'), ('b', '2')]
+
+
+def test_engine_polls_every_tenant(registry, api_calls):
+    bot = check_utils.RecordingBot()
+    engine = PollingEngine(bot, registry, policy=PollPolicy(600, spread=False))
+    assert engine.run_pending(time.time() + 1) == 3
+    assert sorted(api_calls) == [
+        'OAuth token0', 'OAuth token1', 'OAuth token2'
+    ]
+    assert sorted(chat for chat, _ in bot.sent) == ['chat0', 'chat1', 'chat2']
+
+
+def test_engine_reschedules_after_period(registry, api_calls):
+    engine = PollingEngine(check_utils.RecordingBot(), registry, policy=PollPolicy(600, spread=False))
+    start = time.time()
+    assert engine.run_pending(start + 1) == 3
+    assert engine.run_pending(start + 599) == 0
+    assert engine.run_pending(start + 602) == 3
+
+
+def test_engine_skips_unsubscribed(registry, api_calls):
+    engine = PollingEngine(check_utils.RecordingBot(), registry, policy=PollPolicy(600, spread=False))
+    engine.unsubscribe(registry.get(('token1', 'chat1')))
+    start = time.time()
+    assert engine.run_pending(start + 1) == 2
+    assert 'OAuth token1' not in api_calls
+
+
+def test_resubscribed_tenant_is_polled_once(registry, api_calls):
+    engine = PollingEngine(
+        check_utils.RecordingBot(), registry, policy=PollPolicy(600, spread=False)
+    )
+    tenant = registry.get(('token1', 'chat1'))
+    engine.unsubscribe(tenant)
+    engine.subscribe(tenant)
+    assert len(engine) == len(registry)
+    start = time.time()
+    assert engine.run_pending(start + 1) == 3
+    assert engine.run_pending(start + 602) == 3
+    assert api_calls.count('OAuth token1') == 2
+
+
+def test_every_changed_homework_is_notified(monkeypatch, homework_module):
+    response = {
+        'homeworks': [
+            {'id': 2, 'homework_name': 'hw2.zip', 'status': 'reviewing',
+             'date_updated': '2021-04-12T10:00:00Z'},
+            {'id': 1, 'homework_name': 'hw1.zip', 'status': 'approved',
+             'date_updated': '2021-04-11T10:00:00Z'},
+        ],
+        'current_date': 1000,
+    }
+    monkeypatch.setattr(requests, 'get', lambda **kwargs: (
+        check_utils.MockResponseGET(data=response)
+    ))
+    bot = check_utils.RecordingBot()
+    tenant = Tenant('token', 'chat', timestamp=0)
+    homework_module.poll_tenant(bot, tenant)
+    assert [text.split('"')[1] for _, text in bot.sent] == [
+        'hw1.zip', 'hw2.zip'
+    ]
+    assert tenant.status == 'reviewing'
+    assert tenant.timestamp == 1000
+
+    homework_module.poll_tenant(bot, tenant)
+    assert len(bot.sent) == 2
+
+    response['homeworks'][0].update(
+        status='approved', date_updated='2021-04-13T10:00:00Z'
+    )
+    homework_module.poll_tenant(bot, tenant)
+    assert len(bot.sent) == 3
+    assert tenant.status == 'approved'
+
+
+def test_threaded_engine_polls_chats_in_parallel(monkeypatch, homework_module):
+    with PracticumStub(latency=0.1) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        registry = TenantRegistry()
+        for number in range(20):
+            stub.add_homework(f'token{number}', updated=10)
+            registry.add(Tenant(f'token{number}', f'chat{number}', 0))
+        bot = check_utils.RecordingBot()
+        engine = ThreadedPollingEngine(
+            bot, registry, policy=PollPolicy(600, spread=False), workers=10
+        )
+        started = time.monotonic()
+        assert engine.run_pending(time.time() + 1) == 20
+        engine.shutdown()
+    assert time.monotonic() - started < 1
+    assert stub.requests == 20
+    assert len(bot.sent) == 20
+
+
+def test_threaded_engine_keeps_chat_order(monkeypatch, homework_module):
+    with PracticumStub(latency=lambda number: 0.2 if number == 1 else 0) as (
+        stub
+    ):
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        registry = TenantRegistry()
+        for token in ('first', 'second'):
+            stub.add_homework(token, updated=10)
+            registry.add(Tenant(token, 'chat', timestamp=0))
+        tokens = []
+
+        class TokenBot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                tokens.append(current_tenant.get().practicum_token)
+
+        engine = ThreadedPollingEngine(
+            TokenBot(), registry, policy=PollPolicy(600, spread=False), workers=4
+        )
+        engine.run_pending(time.time() + 1)
+        engine.shutdown()
+    assert tokens == ['first', 'second']
+
+
+def test_spread_polls_of_one_token_share_request(
+    monkeypatch, homework_module
+):
+    with PracticumStub(latency=0.1) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        stub.add_homework('student', updated=10)
+        registry = TenantRegistry()
+        for chat in ('personal', 'group', 'mentor'):
+            registry.add(Tenant('student', chat, timestamp=0))
+        engine = ThreadedPollingEngine(
+            check_utils.RecordingBot(), registry, policy=PollPolicy(600), workers=3
+        )
+        now = time.time()
+        polled = 0
+        for second in range(601):
+            polled += engine.run_pending(now + second)
+            if polled:
+                break
+        engine.shutdown()
+    assert polled == 3
+    assert stub.requests == 1
+
+
+def test_threaded_engine_defaults_to_positive_pool(registry):
+    engine = ThreadedPollingEngine(check_utils.RecordingBot(), registry)
+    assert engine.executor._max_workers > 0
+    engine.shutdown()
+
+
+def test_threaded_engine_stop_skips_polls_not_started(
+    monkeypatch, homework_module
+):
+    with PracticumStub() as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        registry = TenantRegistry()
+        for number in range(6):
+            stub.add_homework(f'token{number}', updated=10)
+            registry.add(Tenant(f'token{number}', f'chat{number % 2}', 0))
+
+        class StoppingBot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                engine.stop()
+
+        engine = ThreadedPollingEngine(
+            StoppingBot(), registry, policy=PollPolicy(600, spread=False),
+            workers=1,
+        )
+        assert engine.run_pending(time.time() + 1) == 1
+        engine.shutdown()
+    assert stub.requests == 1
+
+
+def test_unknown_status_does_not_block_other_homeworks(homework_module):
+    bot = check_utils.RecordingBot()
+    tenant = Tenant('token', 'chat', timestamp=0)
+    response = {'homeworks': [
+        {'id': 1, 'homework_name': 'a.zip', 'status': 'lost',
+         'date_updated': '2024-01-01T00:00:00Z'},
+        {'id': 2, 'homework_name': 'b.zip', 'status': 'approved',
+         'date_updated': '2024-01-02T00:00:00Z'},
+    ]}
+    homework_module.notify_status(bot, tenant, response, time.time())
+    assert len(bot.sent) == 2
+    assert 'ParseError' in bot.sent[0][1]
+    assert 'b.zip' in bot.sent[1][1]
+    assert tenant.diff(response['homeworks']) == []
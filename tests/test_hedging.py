@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+import http_client
+from hedging import Hedger, LatencyTracker
+from stub_servers import PracticumStub
+
+
+def warmed_tracker(latency=0.01):
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.record(latency)
+    return tracker
+
+
+def test_tracker_waits_for_samples():
+    tracker = LatencyTracker(min_samples=5)
+    tracker.record(1)
+    assert tracker.estimate() is None
+
+
+def test_tracker_estimates_quantile():
+    tracker = LatencyTracker(quantile=0.95, min_samples=20)
+    for latency in range(100):
+        tracker.record(latency)
+    assert tracker.estimate() == 95
+
+
+def test_hedge_answers_first():
+    calls = []
+
+    def fetch(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.5 if len(calls) == 1 else 0)
+        return len(calls)
+
+    hedger = Hedger(tracker=warmed_tracker(), min_delay=0.01)
+    started = time.monotonic()
+    assert hedger.call(fetch, url='x') == 2
+    assert time.monotonic() - started < 0.3
+    assert calls == [{'url': 'x'}, {'url': 'x'}]
+    assert (hedger.hedged, hedger.hedge_wins) == (1, 1)
+    hedger.shutdown()
+
+
+def test_hedges_are_capped():
+    def fetch():
+        time.sleep(0.05)
+        return 'ok'
+
+    hedger = Hedger(
+        max_per_minute=1, tracker=warmed_tracker(0.001), min_delay=0.001
+    )
+    assert hedger.call(fetch) == 'ok'
+    assert hedger.call(fetch) == 'ok'
+    assert hedger.hedged == 1
+    hedger.shutdown()
+
+
+def test_hedge_failure_falls_back_to_primary():
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) == 2:
+            raise ConnectionError('hedge failed')
+        time.sleep(0.1)
+        return 'primary'
+
+    hedger = Hedger(tracker=warmed_tracker(), min_delay=0.01)
+    assert hedger.call(fetch) == 'primary'
+    hedger.shutdown()
+
+
+@pytest.fixture
+def stub_with_slow_request(monkeypatch, homework_module):
+    with PracticumStub(latency=lambda number: 1 if number == 25 else 0) as (
+        stub
+    ):
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        yield stub
+    http_client.close()
+
+
+def test_get_api_answer_is_hedged(stub_with_slow_request, homework_module):
+    http_client.configure(pool_size=4, hedge_per_minute=10)
+    for timestamp in range(24):
+        homework_module.get_api_answer(timestamp)
+    started = time.monotonic()
+    assert homework_module.get_api_answer(24)['homeworks'] == []
+    assert time.monotonic() - started < 0.5
+    assert http_client._hedger.hedged == 1
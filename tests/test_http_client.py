@@ -0,0 +1,27 @@
+import pytest
+
+import http_client
+from stub_servers import PracticumStub
+
+
+@pytest.fixture
+def stub(monkeypatch, homework_module):
+    with PracticumStub() as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        yield stub
+    http_client.close()
+
+
+def test_session_reuses_connection(stub, homework_module):
+    http_client.configure(pool_size=2)
+    for timestamp in range(5):
+        homework_module.get_api_answer(timestamp)
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+
+def test_without_session_connects_every_time(stub, homework_module):
+    http_client.close()
+    for timestamp in range(3):
+        homework_module.get_api_answer(timestamp)
+    assert stub.connections == 3
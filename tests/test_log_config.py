@@ -0,0 +1,43 @@
+import gzip
+import logging
+
+import log_config
+
+
+def test_rotated_logs_are_compressed(tmp_path):
+    path = tmp_path / 'main.log'
+    handler = log_config.rotating_file_handler(
+        str(path), max_bytes=200, backup_count=2
+    )
+    logger = logging.getLogger('test_rotation')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for number in range(20):
+            logger.error('Сообщение номер %s', number)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    backups = sorted(tmp_path.glob('main.log.*.gz'))
+    assert [backup.name for backup in backups] == [
+        'main.log.1.gz', 'main.log.2.gz'
+    ]
+    with gzip.open(backups[0], 'rt', encoding='utf-8') as file:
+        assert 'Сообщение номер' in file.read()
+
+
+def test_queue_logging_formats_in_listener(tmp_path):
+    path = tmp_path / 'main.log'
+    handler, listener = log_config.queue_logging(
+        log_config.rotating_file_handler(str(path))
+    )
+    logger = logging.getLogger('test_queue')
+    logger.propagate = False
+    logger.addHandler(handler)
+    records = []
+    handler.enqueue = records.append
+    logger.warning('Дата запроса %s', 123)
+    log_config.stop_listener(listener)
+    logger.removeHandler(handler)
+    assert records[0].msg == 'Дата запроса %s'
+    assert records[0].args == (123,)
@@ -0,0 +1,78 @@
+import requests
+
+import metrics
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram('test_seconds', 'Test.', buckets=(1, 5))
+    metrics.REGISTRY.remove(histogram)
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert histogram.render().splitlines() == [
+        '# HELP test_seconds Test.',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="5"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        'test_seconds_sum 14.5',
+        'test_seconds_count 4',
+    ]
+
+
+def test_counter_with_label():
+    counter = metrics.Counter('test_total', 'Test.', label='type')
+    metrics.REGISTRY.remove(counter)
+    counter.inc('RequestError')
+    counter.inc('RequestError')
+    counter.inc('ParseError')
+    assert counter.value('RequestError') == 2
+    assert list(counter.samples()) == [
+        'test_total{type="ParseError"} 1',
+        'test_total{type="RequestError"} 2',
+    ]
+
+
+def test_disabled_metrics_are_not_collected():
+    counter = metrics.Counter('test_total', 'Test.')
+    histogram = metrics.Histogram('test_seconds', 'Test.')
+    metrics.REGISTRY.remove(counter)
+    metrics.REGISTRY.remove(histogram)
+    with metrics.disabled():
+        counter.inc()
+        histogram.observe(1)
+        with histogram.time():
+            pass
+    counter.inc()
+    assert counter.value() == 1
+    assert histogram.count == 0
+
+
+def test_poll_errors_are_counted(monkeypatch, homework_module):
+    def broken_get(**kwargs):
+        raise requests.ConnectionError('down')
+
+    class Bot:
+        def send_message(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(requests, 'get', broken_get)
+    before = metrics.ERRORS.value('RequestError')
+    api_calls = metrics.API_LATENCY.count
+    homework_module.poll_tenant(
+        Bot(), homework_module.Tenant('token', 'chat', timestamp=0)
+    )
+    assert metrics.ERRORS.value('RequestError') == before + 1
+    assert metrics.API_LATENCY.count == api_calls + 1
+
+
+def test_metrics_endpoint():
+    server = metrics.serve(0)
+    try:
+        host, port = server.server_address
+        response = requests.get(f'http://{host}:{port}/metrics', timeout=1)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200
+    assert '# TYPE homework_api_request_seconds histogram' in response.text
+    assert 'homework_outbound_queue_depth 0' in response.text
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+
+import pytest
+import requests
+from telebot import apihelper
+
+import metrics
+from outbox import Outbox, OutboxBot
+from sender import MessageQueue, RetryPolicy, is_transient
+from tests.check_utils import RecordingBot
+
+
+class BlockedBot(RecordingBot):
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if chat_id == 'blocked':
+            raise apihelper.ApiTelegramException('sendMessage', None, {
+                'error_code': 403,
+                'description': 'Forbidden: bot was blocked by the user',
+            })
+        super().send_message(chat_id, text)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'outbox.log')
+
+
+def test_undelivered_records_survive_restart(path):
+    outbox = Outbox(path)
+    first = outbox.append('chat', 'первое')
+    outbox.append('chat', 'второе')
+    outbox.mark_delivered(first)
+    outbox.close()
+    with open(path, 'a', encoding='utf-8') as log:
+        log.write('{"op": "add", "id": 9')
+    restored = Outbox(path)
+    assert [text for _, _, text in restored.pending()] == ['второе']
+    assert restored.append('chat', 'третье') == 3
+    restored.close()
+
+
+def test_replay_sends_pending_notifications(path):
+    outbox = Outbox(path)
+    outbox.append('chat', 'не отправлено')
+    outbox.close()
+    bot = OutboxBot(RecordingBot(), Outbox(path), is_transient)
+    assert bot.replay() == 1
+    assert bot.bot.sent == [('chat', 'не отправлено')]
+    assert len(bot.outbox) == 0
+    bot.outbox.close()
+    assert Outbox(path).pending() == []
+
+
+def test_failed_send_stays_pending_until_next_flush(path):
+    bot = OutboxBot(RecordingBot(fail=True), Outbox(path), is_transient)
+    bot.send_message(chat_id='chat', text='первое')
+    bot.send_message(chat_id='chat', text='второе')
+    assert bot.flush() == 0
+    assert len(bot.outbox) == 2
+    bot.bot.fail = False
+    assert bot.flush() == 2
+    assert bot.bot.sent == [('chat', 'первое'), ('chat', 'второе')]
+    assert len(bot.outbox) == 0
+    bot.outbox.close()
+
+
+def test_permanent_failure_does_not_block_later_records(path):
+    bot = OutboxBot(BlockedBot(), Outbox(path), is_transient)
+    bot.send_message(chat_id='blocked', text='первое')
+    bot.send_message(chat_id='chat', text='второе')
+    assert bot.flush() == 1
+    assert bot.bot.sent == [('chat', 'второе')]
+    bot.outbox.close()
+    assert Outbox(path).pending() == []
+
+
+def test_tick_of_messages_shares_one_fsync(path):
+    bot = RecordingBot()
+    queue = MessageQueue(bot, outbox=Outbox(path))
+    before = metrics.OUTBOX_FSYNCS.value()
+    for number in range(5):
+        queue.send_message('chat', str(number))
+    assert len(queue) == 5
+    assert queue.deliver_due() is None
+    queue.flush()
+    assert metrics.OUTBOX_FSYNCS.value() - before == 1
+    queue.deliver_due()
+    assert bot.sent == [('chat', '0')]
+    queue.outbox.close()
+
+
+def test_dropped_message_stays_in_outbox(path):
+    queue = MessageQueue(
+        RecordingBot(fail=True), outbox=Outbox(path),
+        retry_policy=RetryPolicy(max_attempts=1),
+    )
+    queue.send_message('chat', 'не дошло')
+    queue.flush()
+    queue.deliver_due()
+    assert queue.dropped == 1
+    queue.outbox.close()
+    assert Outbox(path).pending() == [(1, 'chat', 'не дошло')]
+
+
+def test_permanent_failure_is_retired_from_outbox(path):
+    now = [0.0]
+    queue = MessageQueue(
+        BlockedBot(), clock=lambda: now[0], outbox=Outbox(path)
+    )
+    for number in range(5):
+        queue.send_message('blocked', str(number))
+    queue.flush()
+    while len(queue):
+        queue.deliver_due()
+        now[0] += 1
+    assert queue.dropped == 5
+    queue.outbox.close()
+    assert Outbox(path).pending() == []
+
+
+def test_concurrent_appends_share_fsync(path, monkeypatch):
+    fsync = os.fsync
+
+    def slow_fsync(descriptor):
+        time.sleep(0.02)
+        fsync(descriptor)
+
+    monkeypatch.setattr(os, 'fsync', slow_fsync)
+    outbox = Outbox(path)
+    before = metrics.OUTBOX_FSYNCS.value()
+    threads = [
+        threading.Thread(target=outbox.append, args=('chat', str(number)))
+        for number in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(outbox) == 20
+    assert metrics.OUTBOX_FSYNCS.value() - before < 10
+    outbox.close()
+
+
+def test_compaction_keeps_only_pending(path):
+    outbox = Outbox(path, compact_bytes=1024)
+    for number in range(100):
+        outbox.mark_delivered(outbox.append('chat', f'сообщение {number}'))
+    kept = outbox.append('chat', 'последнее')
+    size = os.path.getsize(path)
+    assert outbox.compact()
+    assert os.path.getsize(path) < size / 50
+    assert not outbox.compact()
+    outbox.mark_delivered(outbox.append('chat', 'после сжатия'))
+    outbox.close()
+    assert Outbox(path).pending() == [(kept, 'chat', 'последнее')]
+
+
+def test_message_queue_replays_outbox(path):
+    queue = MessageQueue(RecordingBot(), outbox=Outbox(path))
+    queue.send_message('chat', 'в очереди')
+    queue.outbox.close()
+    bot = RecordingBot()
+    queue = MessageQueue(bot, outbox=Outbox(path))
+    queue.start()
+    deadline = time.monotonic() + 1
+    while not bot.sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.stop(1)
+    assert bot.sent == [('chat', 'в очереди')]
+    assert len(queue.outbox) == 0
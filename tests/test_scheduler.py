@@ -0,0 +1,43 @@
+import pytest
+
+from scheduler import SECONDS_IN_DAY, AdaptivePolicy, PollPolicy
+from tenants import Tenant
+
+
+@pytest.fixture
+def tenant():
+    return Tenant('token', 'chat', timestamp=0, last_change=0)
+
+
+@pytest.fixture
+def policy():
+    return AdaptivePolicy(
+        period=600, reviewing_period=180, max_period=3600
+    )
+
+
+def test_fixed_policy(tenant):
+    assert PollPolicy(600).next_delay(tenant, now=10 ** 9) == 600
+
+
+def test_adaptive_default_period(tenant, policy):
+    assert policy.next_delay(tenant, now=60) == 600
+
+
+def test_adaptive_polls_often_while_reviewing(tenant, policy):
+    tenant.status = 'reviewing'
+    assert policy.next_delay(tenant, now=60) == 180
+
+
+def test_adaptive_backs_off_when_idle(tenant, policy):
+    assert policy.next_delay(tenant, now=SECONDS_IN_DAY) == 1200
+    assert policy.next_delay(tenant, now=30 * SECONDS_IN_DAY) == 3600
+
+
+@pytest.mark.parametrize('errors, delay', [
+    (1, 600), (2, 1200), (3, 2400), (4, 3600), (100, 3600),
+])
+def test_adaptive_backs_off_on_errors(tenant, policy, errors, delay):
+    tenant.status = 'reviewing'
+    tenant.errors = errors
+    assert policy.next_delay(tenant, now=60) == delay
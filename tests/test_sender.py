@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+from telebot import apihelper
+
+from sender import MessageQueue, RetryPolicy, TokenBucket
+from tests.check_utils import FakeClock, RecordingBot
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.take(0)
+    bucket.take(0)
+    assert bucket.delay(0) == 0.5
+    assert bucket.delay(0.5) == 0
+
+
+def test_queue_respects_chat_rate(clock):
+    bot = RecordingBot()
+    queue = MessageQueue(bot, global_rate=30, chat_rate=1, clock=clock)
+    for number in range(3):
+        queue.send_message('a', f'a{number}')
+    queue.send_message('b', 'b0')
+    assert len(queue) == 4
+
+    assert queue.deliver_due() == 1
+    assert bot.sent == [('a', 'a0'), ('b', 'b0')]
+    clock.now = 1
+    queue.deliver_due()
+    clock.now = 2
+    assert queue.deliver_due() is None
+    assert [text for _, text in bot.sent] == ['a0', 'b0', 'a1', 'a2']
+    assert len(queue) == 0
+
+
+def test_queue_respects_global_rate(clock):
+    bot = RecordingBot()
+    queue = MessageQueue(bot, global_rate=5, chat_rate=1, clock=clock)
+    for chat in range(8):
+        queue.send_message(str(chat), 'text')
+    assert queue.deliver_due() == pytest.approx(0.2)
+    assert len(bot.sent) == 5
+    clock.now = 0.6
+    queue.deliver_due()
+    assert len(bot.sent) == 8
+
+
+def test_queue_survives_send_errors(clock):
+    class FailingBot:
+        def send_message(self, **kwargs):
+            raise RuntimeError('boom')
+
+    queue = MessageQueue(FailingBot(), clock=clock)
+    queue.send_message('a', 'text')
+    assert queue.deliver_due() is None
+    assert queue.dropped == 1
+
+
+def test_sender_thread_delivers():
+    bot = RecordingBot()
+    queue = MessageQueue(bot)
+    queue.start()
+    queue.send_message('a', 'text')
+    assert bot.event.wait(1)
+    queue.stop(timeout=1)
+    assert bot.sent == [('a', 'text')]
+
+
+def telegram_error(code, retry_after=None):
+    result_json = {'error_code': code, 'description': 'error'}
+    if retry_after is not None:
+        result_json['parameters'] = {'retry_after': retry_after}
+    return apihelper.ApiTelegramException('sendMessage', None, result_json)
+
+
+class FlakyBot(RecordingBot):
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        super().send_message(chat_id=chat_id, text=text)
+
+
+def test_retry_after_delays_only_its_chat(clock):
+    bot = FlakyBot({'a': [telegram_error(429, retry_after=7)]})
+    queue = MessageQueue(
+        bot, clock=clock, retry_policy=RetryPolicy(random=lambda: 0)
+    )
+    queue.send_message('a', 'a0')
+    queue.send_message('a', 'a1')
+    queue.send_message('b', 'b0')
+    assert queue.deliver_due() == 7
+    assert bot.sent == [('b', 'b0')]
+    assert queue.retried == 1
+    assert len(queue) == 2
+    clock.now = 7
+    queue.deliver_due()
+    clock.now = 8
+    queue.deliver_due()
+    assert bot.sent == [('b', 'b0'), ('a', 'a0'), ('a', 'a1')]
+
+
+def test_retries_are_capped(clock):
+    bot = FlakyBot({'a': [telegram_error(502) for _ in range(3)]})
+    queue = MessageQueue(
+        bot, clock=clock,
+        retry_policy=RetryPolicy(max_attempts=3, random=lambda: 0),
+    )
+    queue.send_message('a', 'text')
+    assert queue.deliver_due() == 1
+    clock.now = 1
+    assert queue.deliver_due() == 2
+    clock.now = 3
+    assert queue.deliver_due() is None
+    assert (queue.retried, queue.dropped, bot.sent) == (2, 1, [])
+
+
+@pytest.mark.parametrize('error, delay', [
+    (telegram_error(429, retry_after=30), 30),
+    (telegram_error(500), 1),
+    (telegram_error(400), None),
+    (telegram_error(403), None),
+])
+def test_retry_policy(error, delay):
+    assert RetryPolicy(random=lambda: 0).delay(error, 1) == delay
+
+
+def test_retry_policy_jitter():
+    policy = RetryPolicy(base_delay=2, random=lambda: 0.5)
+    assert policy.delay(telegram_error(500), 3) == 12
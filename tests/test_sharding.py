@@ -0,0 +1,137 @@
+import pytest
+
+import sharding
+from sharding import HashRing, LeaseStore, ShardedPollingEngine, lease_key
+from state import StateStore
+from tenants import Tenant, TenantRegistry
+
+
+@pytest.fixture
+def tenants():
+    registry = TenantRegistry()
+    for number in range(300):
+        registry.add(Tenant(f'token{number}', str(number)))
+    return registry
+
+
+@pytest.fixture
+def make_worker(tmp_path, tenants):
+    path = str(tmp_path / 'shards.db')
+    workers = []
+
+    def make(worker_id):
+        leases = LeaseStore(path, worker_id, ttl=60)
+        engine = ShardedPollingEngine(
+            None, tenants, leases, heartbeat_interval=10
+        )
+        workers.append(leases)
+        return engine
+
+    yield make
+    for leases in workers:
+        leases.close()
+
+
+def rebalance(engines, now, rounds=2):
+    for _ in range(rounds):
+        for engine in engines:
+            engine.rebalance(now)
+
+
+def owned(engine):
+    return {tenant.key for tenant in engine.registry}
+
+
+def assert_partition(engines, tenants):
+    shares = [owned(engine) for engine in engines]
+    assert sum(map(len, shares)) == len(tenants)
+    assert set().union(*shares) == {tenant.key for tenant in tenants}
+
+
+def test_ring_moves_about_one_nth_of_keys():
+    keys = [f'key{number}' for number in range(3000)]
+    before = HashRing(['a', 'b', 'c', 'd'])
+    after = HashRing(['a', 'b', 'c', 'd', 'e'])
+    moved = [key for key in keys if before.owner(key) != after.owner(key)]
+    assert 0.1 < len(moved) / len(keys) < 0.3
+    assert all(after.owner(key) == 'e' for key in moved)
+
+
+def test_workers_split_tenants_without_overlap(make_worker, tenants):
+    first, second = make_worker('first'), make_worker('second')
+    rebalance([first, second], now=1000)
+    assert_partition([first, second], tenants)
+    assert 0.3 < len(owned(first)) / len(tenants) < 0.7
+
+    before = owned(first) | owned(second)
+    third = make_worker('third')
+    third.rebalance(1005)
+    assert owned(third) == set()
+    first.rebalance(1005)
+    second.rebalance(1005)
+    shares = [owned(first), owned(second)]
+    assert not shares[0] & shares[1]
+    assert (shares[0] | shares[1]) < before
+    third.rebalance(1006)
+    assert_partition([first, second, third], tenants)
+    assert 0.2 < len(owned(third)) / len(tenants) < 0.5
+
+
+def test_crashed_worker_is_replaced_after_ttl(make_worker, tenants):
+    first, second = make_worker('first'), make_worker('second')
+    rebalance([first, second], now=1000)
+    rebalance([first], now=1030)
+    assert len(owned(first)) < len(tenants)
+    rebalance([first], now=1061)
+    assert owned(first) == {tenant.key for tenant in tenants}
+
+
+def test_leaving_worker_hands_over_at_once(make_worker, tenants):
+    first, second = make_worker('first'), make_worker('second')
+    rebalance([first, second], now=1000)
+    second.leases.leave()
+    first.rebalance(1001)
+    assert owned(first) == {tenant.key for tenant in tenants}
+
+
+def test_rejoined_tenants_are_scheduled_once(make_worker, tenants):
+    first, second = make_worker('first'), make_worker('second')
+    rebalance([first], now=1000)
+    rebalance([first, second], now=1001)
+    assert len(first) == len(first.registry) < len(tenants)
+    second.leases.leave()
+    first.rebalance(1002)
+    assert owned(first) == {tenant.key for tenant in tenants}
+    assert len(first) == len(first.registry)
+
+
+def test_lease_keys_hide_tokens():
+    key = lease_key(Tenant('secret-token', '1'))
+    assert 'secret' not in key
+
+
+def test_rebalance_loads_acquired_tenants_at_once(tmp_path, tenants):
+    store = StateStore(':memory:')
+    loads = []
+    load = store.load
+
+    def counting_load(batch):
+        batch = list(batch)
+        loads.append(len(batch))
+        return load(batch)
+
+    store.load = counting_load
+    leases = LeaseStore(str(tmp_path / 'shards.db'), 'only', ttl=60)
+    engine = ShardedPollingEngine(None, tenants, leases, store=store)
+    engine.rebalance(1000)
+    leases.close()
+    store.close()
+    assert loads == [len(tenants)]
+    assert len(engine) == len(tenants)
+
+
+def test_sharded_worker_needs_state_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(sharding.homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setattr(sharding.homework, 'STATE_DB', ':memory:')
+    with pytest.raises(SystemExit):
+        sharding.run_sharded(str(tmp_path / 'tenants.json'))
@@ -0,0 +1,108 @@
+import inspect
+import os
+import signal
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+import telebot
+
+import homework
+import tests.check_utils as check_utils
+from engine import PollingEngine
+from exceptions import ShutdownRequested
+from scheduler import PollPolicy
+from sender import MessageQueue
+from shutdown import GracefulExit
+from state import StateStore
+from tenants import Tenant, TenantRegistry
+
+
+def send_sigterm(after):
+    timer = threading.Timer(after, os.kill, (os.getpid(), signal.SIGTERM))
+    timer.start()
+    return timer
+
+
+def test_signal_sets_flag_and_restores_handler():
+    previous = signal.getsignal(signal.SIGTERM)
+    calls = []
+    with GracefulExit(lambda: calls.append('stop')) as stop:
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert stop.requested
+    assert calls == ['stop']
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+
+def test_signal_interrupts_wait():
+    started = time.monotonic()
+    send_sigterm(0.05)
+    with GracefulExit() as stop:
+        with pytest.raises(ShutdownRequested):
+            with stop.interruptible():
+                time.sleep(5)
+    assert time.monotonic() - started < 1
+
+
+def test_engine_stops_without_waiting_for_next_poll(tmp_path):
+    registry = TenantRegistry()
+    tenant = registry.add(Tenant('token', 'chat', timestamp=5))
+    store = StateStore(str(tmp_path / 'state.db'))
+    engine = PollingEngine(
+        check_utils.RecordingBot(), registry, policy=PollPolicy(600), store=store
+    )
+    started = time.monotonic()
+    send_sigterm(0.05)
+    with GracefulExit(engine.stop):
+        engine.run()
+        engine.close()
+    assert time.monotonic() - started < 1
+    restored = Tenant('token', 'chat')
+    assert store.load([restored]) == 1
+    assert restored.timestamp == tenant.timestamp
+
+
+def test_drain_waits_for_queued_messages():
+    bot = check_utils.RecordingBot()
+    queue = MessageQueue(bot, chat_rate=100)
+    queue.start()
+    for number in range(3):
+        queue.send_message('chat', str(number))
+    assert queue.drain(timeout=1) == 0
+    queue.stop(timeout=1)
+    assert [text for _, text in bot.sent] == ['0', '1', '2']
+
+
+def test_drain_gives_up_after_timeout():
+    queue = MessageQueue(check_utils.RecordingBot(), chat_rate=0.01)
+    queue.start()
+    queue.send_message('chat', 'first')
+    queue.send_message('chat', 'second')
+    started = time.monotonic()
+    assert queue.drain(timeout=0.1) == 1
+    assert time.monotonic() - started < 0.5
+    queue.stop(timeout=1)
+
+
+def test_main_saves_state_on_sigterm(
+    monkeypatch, tmp_path, data_with_new_hw_status
+):
+    monkeypatch.setattr(telebot, 'TeleBot', lambda token: check_utils.RecordingBot())
+    monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'state.db'))
+    def mock_get(*args, **kwargs):
+        return check_utils.MockResponseGET(
+            http_status=HTTPStatus.OK, data=data_with_new_hw_status
+        )
+
+    monkeypatch.setattr(requests.Session, 'get', mock_get)
+    main = inspect.unwrap(homework.main)
+    started = time.monotonic()
+    send_sigterm(0.2)
+    main()
+    assert time.monotonic() - started < 1
+    store = StateStore(str(tmp_path / 'state.db'))
+    tenant = Tenant(homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID)
+    assert store.load([tenant]) == 1
+    assert tenant.message
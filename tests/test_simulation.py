@@ -0,0 +1,76 @@
+import inspect
+import os
+import signal
+from http import HTTPStatus
+
+import requests
+import telebot
+
+import homework
+from clock import VirtualClock
+from scheduler import PollPolicy
+from simulation import SECONDS_IN_WEEK, CountingBot, Simulation
+from tests.check_utils import MockResponseGET
+
+
+def test_simulation_is_deterministic():
+    first = Simulation(5, seed=7).run(SECONDS_IN_WEEK // 2)
+    second = Simulation(5, seed=7).run(SECONDS_IN_WEEK // 2)
+    first.pop('wall_seconds')
+    second.pop('wall_seconds')
+    assert first == second
+    assert first['notifications'] == first['status_changes'] > 0
+
+
+def test_fixed_policy_polls_every_period():
+    simulation = Simulation(5, policy=PollPolicy(600, spread=False))
+    result = simulation.run(SECONDS_IN_WEEK)
+    assert result['api_requests'] == 5 * (SECONDS_IN_WEEK // 600)
+
+
+def test_api_outage_backs_off():
+    simulation = Simulation(10, error_rate=1)
+    result = simulation.run(SECONDS_IN_WEEK)
+    assert result['api_requests'] < 10 * SECONDS_IN_WEEK // 3600 + 10 * 4
+    assert all(tenant.errors > 100 for tenant in simulation.registry)
+
+
+def test_skipping_quiet_polls_keeps_results():
+    for seed in (0, 1):
+        fast = Simulation(5, seed=seed).run(SECONDS_IN_WEEK // 2)
+        full = Simulation(5, seed=seed, skip_quiet=False).run(
+            SECONDS_IN_WEEK // 2
+        )
+        fast.pop('wall_seconds')
+        full.pop('wall_seconds')
+        assert fast == full
+        assert fast['notifications'] > 0
+
+
+def test_slow_api_exhausts_poll_budget():
+    simulation = Simulation(3, latency=homework.TICK_BUDGET + 1)
+    result = simulation.run(24 * 60 * 60)
+    assert result['notifications'] == 0
+    assert all(tenant.errors > 10 for tenant in simulation.registry)
+
+
+def test_main_runs_on_virtual_clock(monkeypatch, data_with_new_hw_status):
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(kwargs['params']['from_date'])
+        if len(calls) == 3:
+            os.kill(os.getpid(), signal.SIGTERM)
+        return MockResponseGET(
+            http_status=HTTPStatus.OK,
+            data=dict(data_with_new_hw_status, current_date=clock.time()),
+        )
+
+    bot = CountingBot()
+    clock = VirtualClock(1_600_000_000)
+    monkeypatch.setattr(telebot, 'TeleBot', lambda token: bot)
+    monkeypatch.setattr(requests.Session, 'get', mock_get)
+    inspect.unwrap(homework.main)(clock)
+    assert calls[0] == 1_600_000_000
+    assert clock.time() - calls[0] >= 2 * 180
+    assert bot.sent == 1
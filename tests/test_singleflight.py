@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+from tenants import Tenant
+from stub_servers import PracticumStub
+
+
+def run_together(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        release.wait(1)
+        return 'ответ'
+
+    def caller():
+        results.append(flight.do('key', work))
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    threads[0].start()
+    while not calls:
+        pass
+    for thread in threads[1:]:
+        thread.start()
+    while flight.shared < 3:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['ответ'] * 4
+    assert flight.do('key', lambda: 'новый') == 'новый'
+
+
+def test_exception_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    def broken():
+        raise ValueError('сбой')
+
+    with pytest.raises(ValueError):
+        flight.do('key', broken)
+    assert flight.do('key', lambda: 1) == 1
+
+
+def test_tenants_with_same_token_share_request(monkeypatch, homework_module):
+    class Bot:
+        def __init__(self):
+            self.sent = []
+
+        def send_message(self, chat_id, text, **kwargs):
+            self.sent.append(chat_id)
+
+    with PracticumStub(latency=0.2) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        stub.add_homework('student', updated=10)
+        bot = Bot()
+        chats = iter(['personal', 'group', 'mentor'])
+        lock = threading.Lock()
+
+        def poll():
+            with lock:
+                tenant = Tenant('student', next(chats), timestamp=0)
+            homework_module.poll_tenant(bot, tenant)
+
+        run_together(3, poll)
+    assert stub.requests == 1
+    assert sorted(bot.sent) == ['group', 'mentor', 'personal']
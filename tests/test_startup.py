@@ -0,0 +1,51 @@
+import io
+import subprocess
+import sys
+
+import dotenv
+
+import startup
+from startup import LazyModule
+
+
+def test_lazy_module_imports_on_first_access(tmp_path, monkeypatch):
+    (tmp_path / 'lazy_target.py').write_text('VALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = LazyModule('lazy_target')
+    assert 'lazy_target' not in sys.modules
+    assert module.VALUE == 42
+    assert 'lazy_target' in sys.modules
+    monkeypatch.setattr(sys.modules['lazy_target'], 'VALUE', 7)
+    assert module.VALUE == 7
+    monkeypatch.delitem(sys.modules, 'lazy_target')
+
+
+def test_homework_import_skips_heavy_modules():
+    code = (
+        'import sys, homework; '
+        'print(*(name in sys.modules for name in '
+        '("requests", "telebot", "asyncio")))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ['False', 'False', 'False']
+
+
+def test_load_env_runs_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dotenv, 'load_dotenv', lambda: calls.append(1))
+    startup.load_env.cache_clear()
+    startup.load_env()
+    startup.load_env()
+    startup.load_env.cache_clear()
+    assert calls == [1]
+
+
+def test_profile_lists_lazy_modules():
+    stream = io.StringIO()
+    startup.print_profile('homework', stream)
+    names = [line.split()[-1] for line in stream.getvalue().splitlines()]
+    assert {'homework', 'requests', 'telebot'} <= set(names)
+    assert names[-1] == 'итого'
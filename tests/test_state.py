@@ -0,0 +1,64 @@
+import pytest
+
+from state import StateStore
+from tenants import Tenant
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'state.sqlite3')
+
+
+def test_state_survives_restart(db_path):
+    tenant = Tenant('token', 'chat', timestamp=100)
+    tenant.remember({'id': 1, 'status': 'reviewing',
+                     'date_updated': '2021-04-11T10:31:09Z'})
+    tenant.remember({'id': 'hw2', 'status': 'approved',
+                     'date_updated': '2021-04-10T10:31:09Z'})
+    tenant.message = 'Последнее сообщение'
+    store = StateStore(db_path)
+    store.save([tenant])
+    store.close()
+    assert not tenant.dirty
+
+    restored = Tenant('token', 'chat', timestamp=999)
+    other = Tenant('token', 'other', timestamp=999)
+    store = StateStore(db_path)
+    assert store.load([restored, other]) == 1
+    assert restored.timestamp == 100
+    assert restored.message == 'Последнее сообщение'
+    assert restored.homeworks == tenant.homeworks
+    assert restored.status == 'reviewing'
+    assert other.timestamp == 999
+    assert not other.homeworks
+
+
+def test_save_writes_only_changed_homeworks(db_path):
+    store = StateStore(db_path)
+    tenant = Tenant('token', 'chat', timestamp=100)
+    tenant.remember({'id': 1, 'status': 'reviewing', 'date_updated': 'a'})
+    store.save([tenant])
+    tenant.homeworks[1] = ('approved', 'b')
+    tenant.timestamp = 200
+    store.save([tenant])
+
+    restored = Tenant('token', 'chat')
+    store.load([restored])
+    assert restored.timestamp == 200
+    assert restored.homeworks == {1: ('reviewing', 'a')}
+
+
+def test_load_reads_only_requested_tenants(db_path, monkeypatch):
+    store = StateStore(db_path)
+    tenants = [Tenant(f'token{number}', 'chat', timestamp=number)
+               for number in range(10)]
+    for tenant in tenants:
+        tenant.remember({'id': 1, 'status': 'approved', 'date_updated': 'a'})
+    store.save(tenants)
+    monkeypatch.setattr('state.LOAD_BATCH', 3)
+
+    restored = [Tenant(f'token{number}', 'chat') for number in (2, 5, 6, 9)]
+    assert store.load(restored) == 4
+    assert [tenant.timestamp for tenant in restored] == [2, 5, 6, 9]
+    assert all(tenant.homeworks == {1: ('approved', 'a')}
+               for tenant in restored)
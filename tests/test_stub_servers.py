@@ -0,0 +1,71 @@
+import pytest
+import requests
+from telebot import TeleBot, apihelper
+
+import sender
+from tenants import Tenant
+from stub_servers import PracticumStub, TelegramStub
+
+
+@pytest.fixture
+def practicum(monkeypatch, homework_module):
+    with PracticumStub(seed=1) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        yield stub
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    with TelegramStub(seed=1) as stub:
+        monkeypatch.setattr(apihelper, 'API_URL', stub.api_url)
+        yield stub
+
+
+def test_practicum_stub_filters_by_from_date(practicum, homework_module):
+    practicum.add_homework('token', status='approved', updated=100)
+    practicum.add_homework('token', status='reviewing', updated=200)
+    practicum.add_homework('other', status='reviewing', updated=200)
+    tenant = Tenant('token', 'chat')
+    token = homework_module.current_tenant.set(tenant)
+    try:
+        response = homework_module.get_api_answer(150)
+    finally:
+        homework_module.current_tenant.reset(token)
+    assert [hw['status'] for hw in response['homeworks']] == ['reviewing']
+
+
+def test_practicum_stub_requires_token(practicum):
+    response = requests.get(practicum.url, timeout=1)
+    assert response.status_code == 401
+
+
+def test_practicum_stub_churn(monkeypatch, homework_module):
+    with PracticumStub(churn=1, seed=1) as stub:
+        monkeypatch.setattr(homework_module, 'ENDPOINT', stub.url)
+        first = homework_module.get_api_answer(0)['homeworks']
+        for _ in range(5):
+            last = homework_module.get_api_answer(0)['homeworks']
+    assert [hw['status'] for hw in first] == ['reviewing']
+    assert last != first
+
+
+def test_poll_through_real_sockets(practicum, telegram, homework_module):
+    practicum.add_homework('token', status='approved', updated=100)
+    bot = TeleBot(token='1234:abcdefg')
+    tenant = Tenant('token', '42', timestamp=0)
+    homework_module.poll_tenant(bot, tenant)
+    assert telegram.messages == [(
+        '42',
+        'Изменился статус проверки работы "hw0.zip".'
+        'Работа проверена: ревьюеру всё понравилось. Ура!',
+    )]
+
+
+def test_telegram_stub_flood(monkeypatch):
+    with TelegramStub(flood_rate=1, retry_after=7) as stub:
+        monkeypatch.setattr(apihelper, 'API_URL', stub.api_url)
+        with pytest.raises(apihelper.ApiTelegramException) as error:
+            TeleBot(token='1234:abcdefg').send_message(1, 'text')
+    assert error.value.error_code == 429
+    assert sender.retry_after(error.value) == 7
+    assert sender.is_transient(error.value)
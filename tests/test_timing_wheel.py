@@ -0,0 +1,104 @@
+import heapq
+import math
+import random
+
+from scheduler import PollPolicy, phase
+from tenants import Tenant
+from timing_wheel import TimingWheel
+
+
+def test_wheel_fires_every_event_on_time():
+    generator = random.Random(3)
+    wheel = TimingWheel(start=1000.5)
+    dues = [1000.5 + generator.uniform(0, 400_000) for _ in range(2000)]
+    for number, due in enumerate(dues):
+        wheel.add(due, number)
+    fired = {}
+    while len(wheel):
+        now = wheel.next_due()
+        for due, number in wheel.pop_due(now):
+            assert due <= now < due + 1
+            fired[number] = now
+    assert len(fired) == len(dues)
+    assert wheel.next_due() is None
+
+
+def test_wheel_returns_overdue_events_at_once():
+    wheel = TimingWheel(start=100)
+    wheel.add(50, 'поздно')
+    wheel.add(100, 'сейчас')
+    wheel.add(101.5, 'скоро')
+    assert [item for _, item in wheel.pop_due(100)] == ['поздно', 'сейчас']
+    assert wheel.pop_due(101.9) == []
+    assert wheel.pop_due(102) == [(101.5, 'скоро')]
+
+
+def test_wheel_skips_idle_time():
+    wheel = TimingWheel(start=0)
+    wheel.add(10 ** 9, 'далеко')
+    assert wheel.next_due() <= 10 ** 9
+    assert wheel.pop_due(10 ** 9 - 1) == []
+    assert wheel.pop_due(10 ** 9) == [(10 ** 9, 'далеко')]
+
+
+def test_overdue_event_does_not_stop_skipping_idle_ticks():
+    wheel = TimingWheel(start=0)
+    advance = wheel._advance
+    calls = []
+    wheel._advance = lambda: calls.append(1) or advance()
+    wheel.add(-5, 'поздно')
+    wheel.add(10 ** 6, 'далеко')
+    assert wheel.pop_due(10 ** 6) == [(-5, 'поздно'), (10 ** 6, 'далеко')]
+    assert len(calls) < 10
+
+
+def test_wheel_matches_heap():
+    for seed in range(5):
+        generator = random.Random(seed)
+        tick = generator.choice((0.5, 1, 2))
+        now = generator.uniform(0, 10 ** 6)
+        wheel = TimingWheel(start=now, tick=tick)
+        heap = []
+        for number in range(1000):
+            due = now + generator.choice((
+                -generator.uniform(0, 10), generator.uniform(0, 100),
+                generator.uniform(0, 10 ** 5), generator.uniform(0, 10 ** 7),
+            ))
+            wheel.add(due, number)
+            heapq.heappush(heap, (math.ceil(due / tick) * tick, number))
+            now += generator.choice((0.1, 3, 500, 10 ** 5, 3 * 10 ** 6))
+            expected = []
+            while heap and heap[0][0] <= math.floor(now / tick) * tick:
+                expected.append(heapq.heappop(heap)[1])
+            fired = [number for _, number in wheel.pop_due(now)]
+            assert sorted(fired) == sorted(expected)
+            assert len(wheel) == len(heap)
+
+
+def test_spread_policy_distributes_first_polls():
+    policy = PollPolicy(600)
+    tenants = [Tenant(f'token{number}', 'chat') for number in range(600)]
+    delays = [policy.first_delay(tenant) for tenant in tenants]
+    assert all(0 <= delay < 600 for delay in delays)
+    per_minute = [0] * 10
+    for delay in delays:
+        per_minute[int(delay // 60)] += 1
+    assert max(per_minute) < 2 * min(per_minute)
+    assert phase(tenants[0]) == phase(Tenant('token0', 'chat'))
+    assert phase(tenants[0]) == phase(Tenant('token0', 'group'))
+    assert PollPolicy(600, spread=False).first_delay(tenants[0]) == 0
+
+
+def test_wheel_never_fires_early_with_coarse_steps():
+    generator = random.Random(5)
+    wheel = TimingWheel(start=0)
+    for number in range(500):
+        wheel.add(generator.uniform(0, 50_000), number)
+    fired = 0
+    now = 0.0
+    while len(wheel):
+        now += generator.choice((0.3, 1, 57, 4000))
+        for due, _ in wheel.pop_due(now):
+            assert due <= now
+            fired += 1
+    assert fired == 500
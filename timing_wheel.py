@@ -0,0 +1,116 @@
+import math
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+Item = TypeVar('Item')
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+
+
+class TimingWheel(Generic[Item]):
+    """Иерархическое колесо таймеров.
+
+    Время делится на тики по tick секунд. Уровень 0 хранит события
+    ближайших 64 тиков по одному слоту на тик, каждый следующий уровень
+    в 64 раза грубее. Вставка кладёт событие в слот за O(1); когда время
+    доходит до границы слота верхнего уровня, его события спускаются
+    ниже. Событие выдаётся не раньше своего времени и не позже чем
+    через тик после него.
+    """
+
+    def __init__(self, start: float, tick: float = 1.0, levels: int = 4):
+        """Создаёт пустое колесо, отсчитывающее время от start."""
+        self.tick = tick
+        self.current = math.floor(start / tick)
+        self._levels: List[List[list]] = [
+            [[] for _ in range(SLOTS)] for _ in range(levels)
+        ]
+        self._occupied = [0] * levels
+        self._expired: list = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Возвращает число событий в колесе."""
+        return self._size
+
+    def add(self, due: float, item: Item) -> None:
+        """Добавляет событие на время due."""
+        self._size += 1
+        self._insert((math.ceil(due / self.tick), due, item))
+
+    def _insert(self, entry: Tuple[int, float, Item]) -> None:
+        delta = entry[0] - self.current
+        if delta <= 0:
+            self._expired.append(entry)
+            return
+        level = min(
+            (delta.bit_length() - 1) // SLOT_BITS, len(self._levels) - 1
+        )
+        slot = (entry[0] >> (SLOT_BITS * level)) & SLOT_MASK
+        self._levels[level][slot].append(entry)
+        self._occupied[level] |= 1 << slot
+
+    def _advance(self) -> None:
+        self.current += 1
+        top = 0
+        while top + 1 < len(self._levels) and not (
+            self.current & ((1 << (SLOT_BITS * (top + 1))) - 1)
+        ):
+            top += 1
+        for level in range(top, 0, -1):
+            slots = self._levels[level]
+            slot = (self.current >> (SLOT_BITS * level)) & SLOT_MASK
+            entries, slots[slot] = slots[slot], []
+            self._occupied[level] &= ~(1 << slot)
+            for entry in entries:
+                self._insert(entry)
+        slots = self._levels[0]
+        slot = self.current & SLOT_MASK
+        if slots[slot]:
+            self._expired.extend(slots[slot])
+            slots[slot] = []
+            self._occupied[0] &= ~(1 << slot)
+
+    def pop_due(self, now: float) -> List[Tuple[float, Item]]:
+        """Снимает события, время которых наступило к now.
+
+        Пустые тики пропускаются прыжком до ближайшего занятого слота.
+        """
+        target = math.floor(now / self.tick)
+        while self.current < target:
+            next_tick = self._next_occupied()
+            if next_tick is None:
+                self.current = target
+                break
+            self.current = max(self.current, min(next_tick, target) - 1)
+            self._advance()
+        expired, self._expired = self._expired, []
+        self._size -= len(expired)
+        return [(due, item) for _, due, item in expired]
+
+    def _next_tick(self) -> Optional[int]:
+        if self._expired:
+            return self.current
+        return self._next_occupied()
+
+    def _next_occupied(self) -> Optional[int]:
+        next_tick = None
+        for level, occupied in enumerate(self._occupied):
+            if not occupied:
+                continue
+            shift = SLOT_BITS * level
+            position = self.current >> shift
+            first = (position + 1) & SLOT_MASK
+            rotated = (occupied >> first) | (occupied << (SLOTS - first))
+            rotated &= (1 << SLOTS) - 1
+            step = (rotated & -rotated).bit_length()
+            start = max((position + step) << shift, self.current + 1)
+            if next_tick is None or start < next_tick:
+                next_tick = start
+        return next_tick
+
+    def next_due(self) -> Optional[float]:
+        """Возвращает время, раньше которого событий нет, или None."""
+        next_tick = self._next_tick()
+        return None if next_tick is None else next_tick * self.tick